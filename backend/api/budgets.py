@@ -0,0 +1,65 @@
+import re
+from collections import Counter, namedtuple
+
+IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+
+
+class QueryBudget(namedtuple("QueryBudget", ("anonymous", "authenticated"))):
+    """Бюджеты для анонимных и авторизованных запросов."""
+
+
+class QueryBudgetExceeded(Exception):
+    """Представление выполнило больше SQL-запросов, чем объявлено."""
+
+
+def query_budget(budget):
+    """Объявить бюджет SQL-запросов для функции-представления."""
+
+    def decorator(view):
+        view.query_budget = budget
+        return view
+
+    return decorator
+
+
+def get_query_budget(request, view_func):
+    """Получить бюджет запросов представления или None.
+
+    У вьюсетов бюджеты объявляются в атрибуте query_budgets по
+    действиям, например {"list": QueryBudget(6, 10)}, у функций —
+    декоратором query_budget. Бюджет — число или QueryBudget, если
+    авторизованный запрос дороже анонимного. В бюджет входят все
+    запросы, выполненные при обработке запроса, включая
+    аутентификацию.
+    """
+    view_class = getattr(view_func, "cls", None)
+    if view_class is None:
+        return getattr(view_func, "query_budget", None)
+    actions = getattr(view_func, "actions", None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return getattr(view_class, "query_budgets", {}).get(action)
+
+
+def resolve_query_budget(budget, user):
+    """Выбрать бюджет для пользователя, уже известного после обработки."""
+    if isinstance(budget, QueryBudget):
+        if user is not None and user.is_authenticated:
+            return budget.authenticated
+        return budget.anonymous
+    return budget
+
+
+def get_fingerprint(sql):
+    """Привести SQL к шаблону без различий в длине списков IN."""
+    return IN_LIST.sub("IN (...)", " ".join(sql.split()))
+
+
+def get_repeated_queries(statements):
+    """Шаблоны SQL, выполненные больше одного раза, с их числом."""
+    return [
+        (fingerprint, count)
+        for fingerprint, count in Counter(
+            map(get_fingerprint, statements)
+        ).most_common()
+        if count > 1
+    ]
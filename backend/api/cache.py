@@ -0,0 +1,260 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag, urlencode
+from rest_framework.response import Response
+
+from recipes.models import Favorite, Recipe, ShoppingCart, Subscription
+
+
+def get_version_key(name):
+    return f"{name}:version"
+
+
+def get_version(name):
+    """Получить общую для всех процессов версию данных.
+
+    Если ключ версии вытеснен из кэша, новая версия берётся из
+    текущего времени и поэтому не совпадает ни с одной из прежних.
+    """
+    version = cache.get(get_version_key(name))
+    if version is None:
+        cache.add(get_version_key(name), time.time_ns() // 1000, None)
+        version = cache.get(get_version_key(name))
+    return version
+
+
+def bump_version(name):
+    """Увеличить версию данных, сделав устаревшими связанные записи."""
+    try:
+        cache.incr(get_version_key(name))
+    except ValueError:
+        cache.add(get_version_key(name), time.time_ns() // 1000, None)
+
+
+class RecipeResponseCacheMixin:
+    """Кэширование списка и детальной страницы рецептов.
+
+    В кэше хранится ответ, построенный как для анонимного
+    пользователя. Признаки избранного, списка покупок и подписки
+    для авторизованного пользователя вычисляются отдельно и
+    накладываются на закэшированный ответ. Ключ включает номер версии,
+    который увеличивается сигналами при изменении рецептов. Счётчики
+    избранного меняются чаще рецептов и подставляются в ответ из кэша
+    отдельным запросом.
+    """
+
+    cache_version_name = "recipes"
+    user_filter_params = ("is_favorited", "is_in_shopping_cart")
+    anonymous_representation = False
+
+    def get_flags_user(self):
+        if self.anonymous_representation:
+            return AnonymousUser()
+        return self.request.user
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.anonymous_representation:
+            context["subscribed_ids"] = set()
+        return context
+
+    def get_response_cache_key(self, request):
+        """Получить ключ ответа ограниченной длины.
+
+        Адрес запроса хэшируется: длинный поиск кириллицей или список
+        тегов иначе превышает допустимую для memcached длину ключа.
+        """
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        url = f"{request.get_host()}{request.path}?{query}"
+        return (
+            f"{self.cache_version_name}:"
+            f"{get_version(self.cache_version_name)}:"
+            f"{hashlib.md5(url.encode()).hexdigest()}"
+        )
+
+    def is_response_cacheable(self, request):
+        return not (
+            request.user.is_authenticated
+            and any(
+                param in request.query_params
+                for param in self.user_filter_params
+            )
+        )
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if not self.is_response_cacheable(request):
+            return handler(request, *args, **kwargs)
+        key = self.get_response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            self.set_counters(data)
+        else:
+            self.anonymous_representation = True
+            try:
+                response = handler(request, *args, **kwargs)
+            finally:
+                self.anonymous_representation = False
+            if response.status_code != 200:
+                return response
+            data = response.data
+            cache.set(key, data, settings.RECIPE_CACHE_TIMEOUT)
+        if request.user.is_authenticated:
+            self.set_user_flags(request.user, data)
+        return Response(data)
+
+    def get_recipe_items(self, data):
+        if isinstance(data, list):
+            return data
+        return data.get("results", [data])
+
+    def set_counters(self, data):
+        recipes = self.get_recipe_items(data)
+        counters = dict(
+            Recipe.objects.filter(
+                id__in=[recipe["id"] for recipe in recipes]
+            ).values_list("id", "favorites_count")
+        )
+        for recipe in recipes:
+            recipe["favorites_count"] = counters.get(
+                recipe["id"], recipe["favorites_count"]
+            )
+
+    def set_user_flags(self, user, data):
+        recipes = self.get_recipe_items(data)
+        recipe_ids = [recipe["id"] for recipe in recipes]
+        author_ids = {recipe["author"]["id"] for recipe in recipes}
+        favorited = set(
+            Favorite.objects.filter(
+                user=user, recipe_id__in=recipe_ids
+            ).values_list("recipe_id", flat=True)
+        )
+        in_shopping_cart = set(
+            ShoppingCart.objects.filter(
+                user=user, recipe_id__in=recipe_ids
+            ).values_list("recipe_id", flat=True)
+        )
+        subscribed = set(
+            Subscription.objects.filter(
+                user=user, author_id__in=author_ids
+            ).values_list("author_id", flat=True)
+        )
+        for recipe in recipes:
+            recipe["is_favorited"] = recipe["id"] in favorited
+            recipe["is_in_shopping_cart"] = recipe["id"] in in_shopping_cart
+            recipe["author"]["is_subscribed"] = (
+                recipe["author"]["id"] in subscribed
+            )
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class RecipeConditionalGetMixin:
+    """Условные GET-запросы к списку и детальной странице рецептов.
+
+    ETag вычисляется до сериализации одним запросом к строкам рецептов:
+    для страницы списка — к её записям вместе с общим их числом, для
+    рецепта — к его строке. В ETag входят id, даты изменения, счётчик
+    избранного и отметки пользователя: избранное, список покупок и
+    подписка на автора. При совпадении If-None-Match ответ 304
+    отдаётся без построения данных. Last-Modified отдаётся для
+    сведения и не проверяется: счётчики и состав страницы меняются без
+    изменения дат.
+    """
+
+    def get_state_queryset(self, queryset, user):
+        """Оставить в запросе только поля, от которых зависит ETag."""
+        fields = [
+            "id",
+            "updated_at",
+            "favorites_count",
+            "is_favorited",
+            "is_in_shopping_cart",
+        ]
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_subscribed=Exists(
+                    Subscription.objects.filter(
+                        user=user, author=OuterRef("author")
+                    )
+                )
+            )
+            fields.append("is_subscribed")
+        return queryset.values(*fields)
+
+    def get_list_state(self, request):
+        """Получить строки страницы списка или None без пагинации."""
+        if self.paginator is None:
+            return None
+        queryset = self.paginator.get_page_queryset(
+            self.get_state_queryset(
+                self.filter_queryset(self.get_queryset()), request.user
+            ),
+            request,
+        )
+        return None if queryset is None else list(queryset)
+
+    def get_recipe_state(self, pk, user):
+        """Получить строку рецепта или None для неверного id."""
+        try:
+            queryset = Recipe.objects.filter(pk=pk).with_user_flags(user)
+        except (TypeError, ValueError):
+            return None
+        return list(self.get_state_queryset(queryset, user))
+
+    def get_etag(self, request, rows):
+        data = (
+            request.accepted_media_type,
+            request.get_full_path(),
+            *(tuple(row.values()) for row in rows),
+        )
+        return quote_etag(hashlib.md5(repr(data).encode()).hexdigest())
+
+    def get_conditional(self, handler, rows, request, *args, **kwargs):
+        """Ответить 304 по ETag или построить ответ обработчиком."""
+        if rows is None:
+            return handler(request, *args, **kwargs)
+        etag = self.get_etag(request, rows)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response["ETag"] = etag
+        if rows:
+            response["Last-Modified"] = http_date(
+                max(row["updated_at"] for row in rows).timestamp()
+            )
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional(
+            super().list,
+            self.get_list_state(request),
+            request,
+            *args,
+            **kwargs,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional(
+            super().retrieve,
+            self.get_recipe_state(kwargs[self.lookup_field], request.user),
+            request,
+            *args,
+            **kwargs,
+        )
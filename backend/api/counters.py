@@ -0,0 +1,63 @@
+import atexit
+import logging
+from collections import Counter
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from recipes.models import ShortLink
+
+logger = logging.getLogger(__name__)
+
+
+class ClickCounter:
+    """Буфер переходов по коротким ссылкам в памяти процесса.
+
+    Переходы накапливаются по кодам ссылок и записываются в базу
+    одним запросом после отправки ответа, когда набралось
+    SHORT_LINK_CLICKS_FLUSH_SIZE переходов или прошло
+    SHORT_LINK_CLICKS_FLUSH_INTERVAL секунд с прошлой записи.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.counts = Counter()
+        self.total = 0
+        self.flushed_at = monotonic()
+
+    def add(self, short_link):
+        with self.lock:
+            self.counts[short_link] += 1
+            self.total += 1
+
+    def is_due(self):
+        return self.total and (
+            self.total >= settings.SHORT_LINK_CLICKS_FLUSH_SIZE
+            or monotonic() - self.flushed_at
+            >= settings.SHORT_LINK_CLICKS_FLUSH_INTERVAL
+        )
+
+    def flush(self, force=False):
+        """Записать накопленные переходы, если подошло время."""
+        with self.lock:
+            if not (self.total if force else self.is_due()):
+                return False
+            counts = self.counts
+            self.counts = Counter()
+            self.total = 0
+            self.flushed_at = monotonic()
+        try:
+            ShortLink.objects.add_clicks(counts)
+        except DatabaseError:
+            logger.exception("Не удалось записать переходы по ссылкам.")
+            with self.lock:
+                self.counts.update(counts)
+                self.total += sum(counts.values())
+            return False
+        return True
+
+
+click_counter = ClickCounter()
+atexit.register(click_counter.flush, force=True)
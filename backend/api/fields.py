@@ -1,4 +1,5 @@
 import base64
+from uuid import uuid4
 
 from django.core.files.base import ContentFile
 from rest_framework import serializers
@@ -11,5 +12,79 @@ class Base64ImageField(serializers.ImageField):
         if isinstance(data, str) and data.startswith("data:image"):
             format, imgstr = data.split(";base64,")
             ext = format.split("/")[-1]
-            data = ContentFile(base64.b64decode(imgstr), name="temp." + ext)
+            data = ContentFile(
+                base64.b64decode(imgstr), name=f"{uuid4().hex}.{ext}"
+            )
         return super().to_internal_value(data)
+
+
+def build_file_url(storage, name, request):
+    url = storage.url(name)
+    return request.build_absolute_uri(url) if request else url
+
+
+def get_rendition_sizes(instance, image_field, renditions_field):
+    """Получить копии изображения, если они сделаны с текущего файла."""
+    renditions = getattr(instance, renditions_field)
+    if renditions.get("source") != getattr(instance, image_field).name:
+        return {}
+    return renditions.get("sizes", {})
+
+
+class RenditionsField(serializers.Field):
+    """Адреса уменьшенных копий изображения по ширинам и форматам."""
+
+    def __init__(self, image_field, renditions_field, **kwargs):
+        self.image_field = image_field
+        self.renditions_field = renditions_field
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        request = self.context.get("request")
+        storage = getattr(instance, self.image_field).storage
+        return {
+            width: {
+                extension: build_file_url(storage, name, request)
+                for extension, name in formats.items()
+            }
+            for width, formats in get_rendition_sizes(
+                instance, self.image_field, self.renditions_field
+            ).items()
+        }
+
+
+class RenditionImageField(serializers.Field):
+    """Изображение для карточки: копия в JPEG или оригинал.
+
+    Выбирается самая узкая копия не уже width, а при её отсутствии
+    самая широкая из имеющихся.
+    """
+
+    def __init__(self, image_field, renditions_field, width, **kwargs):
+        self.image_field = image_field
+        self.renditions_field = renditions_field
+        self.width = width
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        image = getattr(instance, self.image_field)
+        if not image:
+            return None
+        sizes = get_rendition_sizes(
+            instance, self.image_field, self.renditions_field
+        )
+        widths = sorted(map(int, sizes))
+        name = image.name
+        if widths:
+            width = next(
+                (width for width in widths if width >= self.width),
+                widths[-1],
+            )
+            name = sizes[str(width)]["jpeg"]
+        return build_file_url(
+            image.storage, name, self.context.get("request")
+        )
@@ -1,21 +1,18 @@
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Ingredient, Tag, Recipe
+from api.indexes import tag_registry
+from api.search import search_recipes
+from recipes.models import Recipe
 
 
-class IngredientFilter(FilterSet):
-    name = filters.CharFilter(lookup_expr="istartswith")
-
-    class Meta:
-        model = Ingredient
-        fields = ["name"]
+def get_tag_choices():
+    return tag_registry.choices()
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name="tags__slug",
-        to_field_name="slug",
+    tags = filters.MultipleChoiceFilter(
+        choices=get_tag_choices,
+        method="get_tags",
     )
     is_favorited = filters.BooleanFilter(
         method="get_is_favorited",
@@ -23,6 +20,17 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method="get_is_in_shopping_cart"
     )
+    search = filters.CharFilter(method="get_search")
+
+    def get_tags(self, queryset, name, value):
+        return queryset.filter(
+            id__in=Recipe.tags.through.objects.filter(
+                tag_id__in=tag_registry.get_ids(value)
+            ).values("recipe_id")
+        )
+
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
 
     def get_is_in_shopping_cart(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
@@ -36,4 +44,10 @@ class RecipeFilter(FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ("author", "tags", "is_favorited", "is_in_shopping_cart")
+        fields = (
+            "author",
+            "tags",
+            "is_favorited",
+            "is_in_shopping_cart",
+            "search",
+        )
@@ -1,13 +1,68 @@
+from django.core.cache import cache
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect
+from rest_framework import serializers
 
+from api.budgets import query_budget
+from api.counters import click_counter
+from recipes.constants import (
+    MIN_VALUE,
+    SHORT_LINK_ALPHABET,
+    SHORT_LINK_CACHE_TIMEOUT,
+)
 from recipes.models import ShortLink
 
 
+def get_short_link_cache_key(short_link):
+    return f"short_link:{short_link}"
+
+
+def get_short_link_target(short_link):
+    """Получить адрес рецепта по короткой ссылке.
+
+    Найденные адреса хранятся в общем для всех процессов кэше, из
+    которого сигналы удаляют изменённые и удалённые ссылки.
+    Отсутствующие ссылки не кэшируются.
+    """
+
+    if not set(short_link) <= set(SHORT_LINK_ALPHABET):
+        raise Http404
+    key = get_short_link_cache_key(short_link)
+    target = cache.get(key)
+    if target is None:
+        recipe_id = get_object_or_404(
+            ShortLink.objects.values_list("recipe_id", flat=True),
+            short_link=short_link,
+        )
+        target = f"/recipes/{recipe_id}"
+        cache.set(key, target, SHORT_LINK_CACHE_TIMEOUT)
+    return target
+
+
+@query_budget(1)
 def redirect_link(request, short_link):
     """Метод переадресации ссылок."""
 
-    link = get_object_or_404(
-        ShortLink,
-        short_link=short_link
-    )
-    return redirect(link.full_link)
+    response = redirect(get_short_link_target(short_link))
+    click_counter.add(short_link)
+    return response
+
+
+def get_limit(request, param):
+    """Получить положительное ограничение из параметра запроса."""
+
+    limit = request.query_params.get(param)
+    if not limit:
+        return None
+    try:
+        return serializers.IntegerField(
+            min_value=MIN_VALUE
+        ).run_validation(limit)
+    except serializers.ValidationError as error:
+        raise serializers.ValidationError({param: error.detail})
+
+
+def get_recipes_limit(request):
+    """Получить ограничение числа рецептов из параметров запроса."""
+
+    return get_limit(request, "recipes_limit")
@@ -0,0 +1,106 @@
+from bisect import bisect_left
+from threading import Lock
+
+from api.cache import get_version
+from api.serializers import TagGetSerializer
+from recipes.models import Ingredient, Tag
+
+
+class VersionedData:
+    """Данные в памяти процесса, перечитываемые при смене версии.
+
+    Вместе с данными запоминается общая версия из кэша, которую
+    сигналы и команды загрузки увеличивают при изменении исходных
+    таблиц, поэтому данные перечитываются во всех процессах.
+    """
+
+    version_name = None
+
+    def __init__(self):
+        self.lock = Lock()
+        self.data = None
+        self.version = None
+
+    def load(self):
+        raise NotImplementedError
+
+    def get_data(self):
+        version = get_version(self.version_name)
+        data = self.data
+        if data is None or self.version != version:
+            with self.lock:
+                if self.data is None or self.version != version:
+                    self.data = self.load()
+                    self.version = version
+                data = self.data
+        return data
+
+
+class IngredientIndex(VersionedData):
+    """Индекс названий ингредиентов в памяти процесса.
+
+    Названия хранятся в верхнем регистре в отсортированном списке,
+    как их сравнивает фильтр istartswith, поэтому поиск по префиксу
+    сводится к двум бинарным поискам. Найденные ингредиенты
+    возвращаются в порядке сортировки модели.
+    """
+
+    version_name = "ingredients"
+
+    def load(self):
+        items = list(
+            Ingredient.objects.values("id", "name", "measurement_unit")
+        )
+        positions = sorted(
+            range(len(items)),
+            key=lambda position: items[position]["name"].upper(),
+        )
+        keys = [items[position]["name"].upper() for position in positions]
+        return items, keys, positions
+
+    def search(self, prefix="", limit=None):
+        """Найти ингредиенты, название которых начинается с prefix."""
+        items, keys, positions = self.get_data()
+        prefix = prefix.upper()
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + chr(0x10FFFF), lo=start)
+        found = sorted(positions[start:end])[:limit]
+        return [items[position] for position in found]
+
+
+class TagRegistry(VersionedData):
+    """Каталог тегов в памяти процесса.
+
+    Хранит сериализованные теги и соответствие слагов их id.
+    """
+
+    version_name = "tags"
+
+    def load(self):
+        items = TagGetSerializer(Tag.objects.all(), many=True).data
+        by_id = {item["id"]: item for item in items}
+        by_slug = {item["slug"]: item["id"] for item in items}
+        return items, by_id, by_slug
+
+    def list(self):
+        """Получить все теги в порядке сортировки модели."""
+        return self.get_data()[0]
+
+    def get(self, tag_id):
+        """Получить тег по id или None, если его нет."""
+        try:
+            return self.get_data()[1].get(int(tag_id))
+        except (TypeError, ValueError):
+            return None
+
+    def choices(self):
+        return [(slug, slug) for slug in self.get_data()[2]]
+
+    def get_ids(self, slugs):
+        """Получить id тегов по слагам."""
+        by_slug = self.get_data()[2]
+        return [by_slug[slug] for slug in slugs if slug in by_slug]
+
+
+ingredient_index = IngredientIndex()
+tag_registry = TagRegistry()
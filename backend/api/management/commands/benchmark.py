@@ -0,0 +1,368 @@
+import json
+import random
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from rest_framework.authtoken.models import Token
+
+from api.counters import click_counter
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingCartIngredient,
+    ShortLink,
+    Subscription,
+    Tag,
+    User,
+)
+
+LOCMEM_CACHE = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "benchmark",
+    }
+}
+DUMMY_CACHE = {
+    "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+}
+
+
+def percentile(values, percent):
+    """Процентиль отсортированного списка по ближайшему рангу."""
+    rank = max(1, round(percent / 100 * len(values)))
+    return values[rank - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Замерить число SQL-запросов и задержку основных эндпоинтов API "
+        "на сгенерированных данных во временной тестовой базе."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--recipes", type=int, default=500)
+        parser.add_argument(
+            "--ingredients-per-recipe", type=int, default=8
+        )
+        parser.add_argument("--favorites-per-user", type=int, default=20)
+        parser.add_argument("--carts-per-user", type=int, default=5)
+        parser.add_argument(
+            "--subscriptions-per-user", type=int, default=10
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=20,
+            help="Число замеров каждого эндпоинта после прогрева.",
+        )
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Отключить кэш ответов на время замеров.",
+        )
+        parser.add_argument(
+            "--output",
+            help="Файл для результатов в формате JSON.",
+        )
+        parser.add_argument(
+            "--baseline",
+            help="Файл с прошлыми результатами для сравнения.",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=1.0,
+            help="Допустимый относительный рост p50 по сравнению с "
+                 "базовыми результатами.",
+        )
+        parser.add_argument(
+            "--min-delta",
+            type=float,
+            default=5,
+            help="Рост p50 в миллисекундах, меньше которого "
+                 "регрессия не засчитывается.",
+        )
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("Число замеров должно быть положительным.")
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"], encoding="utf-8") as file:
+                baseline = json.load(file)
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        try:
+            with override_settings(
+                CACHES=DUMMY_CACHE if options["no_cache"] else LOCMEM_CACHE,
+                ALLOWED_HOSTS=["testserver"],
+                JOBS_EAGER=False,
+                QUERY_BUDGET_RAISE=True,
+            ):
+                self.seed(options)
+                results = self.run_endpoints(
+                    options["iterations"], not options["no_cache"]
+                )
+        finally:
+            click_counter.flush(force=True)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            "dataset": {
+                name: options[name]
+                for name in (
+                    "users",
+                    "recipes",
+                    "ingredients_per_recipe",
+                    "favorites_per_user",
+                    "carts_per_user",
+                    "subscriptions_per_user",
+                    "seed",
+                )
+            },
+            "database": connection.vendor,
+            "cache": not options["no_cache"],
+            "iterations": options["iterations"],
+            "results": results,
+        }
+        data = json.dumps(report, ensure_ascii=False, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                file.write(data + "\n")
+        else:
+            self.stdout.write(data)
+
+        if baseline is not None:
+            regressions = self.compare(
+                results,
+                baseline.get("results", {}),
+                options["tolerance"],
+                options["min_delta"],
+            )
+            if regressions:
+                raise CommandError(
+                    "Обнаружены регрессии:\n" + "\n".join(regressions)
+                )
+            self.stderr.write(self.style.SUCCESS("Регрессий нет."))
+
+    def seed(self, options):
+        """Заполнить тестовую базу данными для замеров."""
+        rng = random.Random(options["seed"])
+        call_command(
+            "load_csv_data",
+            str(settings.BASE_DIR / "data" / "ingredients.csv"),
+            stdout=StringIO(),
+        )
+        ingredient_ids = list(Ingredient.objects.values_list("id", flat=True))
+        Tag.objects.bulk_create(
+            Tag(name=f"Тег {number}", color=f"#0000{number:02d}",
+                slug=f"tag{number}")
+            for number in range(6)
+        )
+        tags = list(Tag.objects.order_by("id"))
+        User.objects.bulk_create(
+            User(
+                email=f"user{number}@example.com",
+                username=f"user{number}",
+                first_name="Имя",
+                last_name="Фамилия",
+            )
+            for number in range(options["users"])
+        )
+        users = list(User.objects.order_by("id"))
+        Recipe.objects.bulk_create(
+            Recipe(
+                name=f"Рецепт {number}",
+                text="Описание рецепта",
+                author=rng.choice(users),
+                cooking_time=rng.randint(5, 120),
+                image="recipes/benchmark.png",
+            )
+            for number in range(options["recipes"])
+        )
+        recipes = list(Recipe.objects.order_by("id"))
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=ingredient_id,
+                amount=rng.randint(1, 500),
+            )
+            for recipe in recipes
+            for ingredient_id in rng.sample(
+                ingredient_ids, options["ingredients_per_recipe"]
+            )
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes
+            for tag in rng.sample(tags, rng.randint(1, 3))
+        )
+        for model, per_user in (
+            (Favorite, options["favorites_per_user"]),
+            (ShoppingCart, options["carts_per_user"]),
+        ):
+            model.objects.bulk_create(
+                model(user=user, recipe=recipe)
+                for user in users
+                for recipe in rng.sample(recipes, min(per_user, len(recipes)))
+            )
+        Subscription.objects.bulk_create(
+            Subscription(user=user, author=author)
+            for user in users
+            for author in rng.sample(
+                users, min(options["subscriptions_per_user"], len(users))
+            )
+            if author != user
+        )
+        for user in users:
+            ShoppingCartIngredient.objects.add_recipes(
+                user,
+                list(user.carts.values_list("recipe_id", flat=True)),
+            )
+        call_command("recount", stdout=StringIO())
+        for recipe in recipes:
+            ShortLink.objects.create(recipe=recipe)
+
+        self.user = max(users, key=lambda user: user.carts.count())
+        self.token = Token.objects.create(user=self.user).key
+        self.recipe = recipes[0]
+        self.tag = tags[0]
+        self.short_link = ShortLink.objects.get(recipe=self.recipe).short_link
+
+    def get_endpoints(self):
+        recipe_id = self.recipe.id
+        return {
+            "recipes_list_6": (False, "/api/recipes/?limit=6"),
+            "recipes_list_24": (False, "/api/recipes/?limit=24"),
+            "recipes_list_100": (False, "/api/recipes/?limit=100"),
+            "recipes_list_6_auth": (True, "/api/recipes/?limit=6"),
+            "recipes_list_cursor": (False, "/api/recipes/?limit=24&cursor="),
+            "recipes_filter_tags": (
+                False, f"/api/recipes/?limit=6&tags={self.tag.slug}"
+            ),
+            "recipes_filter_author": (
+                False, f"/api/recipes/?limit=6&author={self.user.id}"
+            ),
+            "recipes_filter_favorited": (
+                True, "/api/recipes/?limit=6&is_favorited=1"
+            ),
+            "recipes_filter_shopping_cart": (
+                True, "/api/recipes/?limit=6&is_in_shopping_cart=1"
+            ),
+            "recipes_search": (False, "/api/recipes/?limit=6&search=рецепт"),
+            "recipe_detail": (False, f"/api/recipes/{recipe_id}/"),
+            "recipe_detail_auth": (True, f"/api/recipes/{recipe_id}/"),
+            "subscriptions": (
+                True, "/api/users/subscriptions/?limit=6&recipes_limit=3"
+            ),
+            "ingredients_search": (False, "/api/ingredients/?name=мол"),
+            "tags": (False, "/api/tags/"),
+            "download_shopping_cart": (
+                True, "/api/recipes/download_shopping_cart/?format=txt"
+            ),
+            "short_link_redirect": (False, f"/s/{self.short_link}/"),
+        }
+
+    def request(self, client, url, auth):
+        headers = {"HTTP_AUTHORIZATION": f"Token {self.token}"} if auth else {}
+        response = client.get(url, **headers)
+        if getattr(response, "streaming", False):
+            b"".join(response.streaming_content)
+        if response.status_code >= 400:
+            raise CommandError(f"{url}: ответ {response.status_code}.")
+        return response
+
+    def measure(self, client, url, auth, iterations, cold):
+        """Замерить эндпоинт, при cold очищая кэш перед каждым замером."""
+        timings = []
+        queries = 0
+        for _ in range(iterations):
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                started_at = time.perf_counter()
+                self.request(client, url, auth)
+                timings.append((time.perf_counter() - started_at) * 1000)
+            queries = max(queries, len(context.captured_queries))
+        timings.sort()
+        return {
+            "url": url,
+            "queries": queries,
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "p99_ms": round(percentile(timings, 99), 2),
+            "mean_ms": round(sum(timings) / len(timings), 2),
+        }
+
+    def run_endpoints(self, iterations, uncached):
+        """Замерить эндпоинты: один прогрев и заданное число замеров.
+
+        С включённым кэшем эндпоинты замеряются дважды: с прогретым
+        кэшем и с очищенным перед каждым замером (результат с
+        суффиксом _uncached), иначе рост числа запросов в обходе кэша
+        не попадает в результаты.
+        """
+        client = Client()
+        results = {}
+        for name, (auth, url) in self.get_endpoints().items():
+            self.request(client, url, auth)
+            passes = [(name, False)]
+            if uncached:
+                passes.append((f"{name}_uncached", True))
+            for result_name, cold in passes:
+                result = self.measure(client, url, auth, iterations, cold)
+                results[result_name] = result
+                self.stderr.write(
+                    f"{result_name}: {result['queries']} запросов, "
+                    f"p50 {result['p50_ms']} мс, "
+                    f"p95 {result['p95_ms']} мс."
+                )
+        return results
+
+    def compare(self, results, baseline, tolerance, min_delta):
+        """Найти эндпоинты, ставшие медленнее базовых результатов.
+
+        Регрессией считается любой рост числа запросов и рост медианы
+        больше чем в 1 + tolerance раз и больше чем на min_delta мс:
+        медиана меньше хвостов зависит от случайных задержек.
+        """
+        regressions = []
+        for name, result in results.items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+            if result["queries"] > base["queries"]:
+                regressions.append(
+                    f"{name}: запросов {result['queries']} "
+                    f"вместо {base['queries']}"
+                )
+            if (
+                result["p50_ms"] > base["p50_ms"] * (1 + tolerance)
+                and result["p50_ms"] - base["p50_ms"] > min_delta
+            ):
+                regressions.append(
+                    f"{name}: p50 {result['p50_ms']} мс "
+                    f"вместо {base['p50_ms']} мс"
+                )
+        return regressions
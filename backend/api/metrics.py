@@ -0,0 +1,173 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+HISTOGRAMS = {
+    "foodgram_request_duration_seconds": (
+        "Время обработки запроса.", DURATION_BUCKETS
+    ),
+    "foodgram_request_db_seconds": (
+        "Время SQL-запросов за запрос.", DURATION_BUCKETS
+    ),
+    "foodgram_request_serializer_seconds": (
+        "Время сериализации ответа.", DURATION_BUCKETS
+    ),
+    "foodgram_request_queries": (
+        "Число SQL-запросов за запрос.", QUERY_BUCKETS
+    ),
+}
+
+current_timing = ContextVar("current_timing", default=None)
+
+
+class RequestTiming:
+    """Замеры одного запроса: SQL-запросы, сериализация и общее время.
+
+    Если включено сохранение запросов, тексты SQL собираются в
+    statements для проверки бюджета запросов.
+    """
+
+    def __init__(self, capture_statements=False):
+        self.started_at = perf_counter()
+        self.statements = [] if capture_statements else None
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обёртка выполнения SQL для connection.execute_wrapper."""
+        started_at = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += perf_counter() - started_at
+            self.queries += 1
+            if self.statements is not None:
+                self.statements.append(sql)
+
+    @property
+    def total_time(self):
+        return perf_counter() - self.started_at
+
+
+@contextmanager
+def serializer_timer():
+    """Учесть время сериализации в замерах текущего запроса.
+
+    Вложенные сериализаторы учитываются в объемлющем, поэтому время
+    не считается дважды.
+    """
+    timing = current_timing.get()
+    if timing is None:
+        yield
+        return
+    timing.serializer_depth += 1
+    started_at = perf_counter()
+    try:
+        yield
+    finally:
+        timing.serializer_depth -= 1
+        if not timing.serializer_depth:
+            timing.serializer_time += perf_counter() - started_at
+
+
+class TimedRepresentationMixin:
+    """Замер времени to_representation сериализатора."""
+
+    def to_representation(self, instance):
+        with serializer_timer():
+            return super().to_representation(instance)
+
+
+class MetricsRegistry:
+    """Гистограммы замеров запросов по представлениям.
+
+    Данные хранятся в памяти процесса: при нескольких процессах
+    gunicorn каждый отдаёт на /metrics свои значения.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.histograms = {}
+
+    def observe(self, view, values):
+        with self.lock:
+            for name, value in values.items():
+                buckets = HISTOGRAMS[name][1]
+                counts, total = self.histograms.get(
+                    (name, view), ([0] * (len(buckets) + 1), 0)
+                )
+                counts[bisect_left(buckets, value)] += 1
+                self.histograms[(name, view)] = (counts, total + value)
+
+    def render(self):
+        """Вывести гистограммы в текстовом формате Prometheus."""
+        with self.lock:
+            histograms = {
+                key: (list(counts), total)
+                for key, (counts, total) in self.histograms.items()
+            }
+        lines = []
+        for name, (help_text, buckets) in HISTOGRAMS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, view), (counts, total) in sorted(
+                histograms.items()
+            ):
+                if metric != name:
+                    continue
+                label = escape_label(view)
+                cumulative = 0
+                for bound, count in zip((*buckets, "+Inf"), counts):
+                    cumulative += count
+                    lines.append(
+                        f'{name}_bucket{{view="{label}",le="{bound}"}} '
+                        f"{cumulative}"
+                    )
+                lines.append(f'{name}_sum{{view="{label}"}} {total}')
+                lines.append(f'{name}_count{{view="{label}"}} {cumulative}')
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value):
+    return (
+        value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    )
+
+
+def has_metrics_token(request, header):
+    token = settings.METRICS_TOKEN
+    return bool(token) and constant_time_compare(
+        request.headers.get(header, "").removeprefix("Bearer "), token
+    )
+
+
+def metrics_view(request):
+    """Отдать накопленные метрики для Prometheus.
+
+    Доступно персоналу или по токену METRICS_TOKEN в заголовке
+    Authorization: Bearer.
+    """
+    if not (
+        request.user.is_staff or has_metrics_token(request, "Authorization")
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics_registry.render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+metrics_registry = MetricsRegistry()
@@ -0,0 +1,125 @@
+import logging
+from random import random
+
+from django.conf import settings
+from django.db import connection
+
+from api.budgets import (
+    QueryBudgetExceeded,
+    get_query_budget,
+    get_repeated_queries,
+    resolve_query_budget,
+)
+from api.metrics import (
+    RequestTiming,
+    current_timing,
+    has_metrics_token,
+    metrics_registry,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def get_view_name(request, view_func):
+    """Получить имя представления для меток метрик.
+
+    Для вьюсетов это имя класса и действия, например
+    RecipeViewSet.list, для остальных представлений — имя маршрута.
+    """
+    view_class = getattr(view_func, "cls", None)
+    if view_class is not None:
+        actions = getattr(view_func, "actions", None) or {}
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f"{view_class.__name__}.{action}"
+    match = request.resolver_match
+    return match.view_name if match else view_func.__name__
+
+
+class ServerTimingMiddleware:
+    """Замеры запросов для заголовка Server-Timing и /metrics.
+
+    Для каждого запроса считаются SQL-запросы и их время, время
+    сериализации и общее время; значения попадают в гистограммы по
+    представлениям. Заголовок Server-Timing добавляется для персонала,
+    в режиме DEBUG и для запросов с заголовком X-Server-Timing,
+    содержащим METRICS_TOKEN. Для потоковых ответов учитывается
+    только время до начала передачи.
+
+    Если представление превысило объявленный бюджет SQL-запросов,
+    при QUERY_BUDGET_RAISE выбрасывается QueryBudgetExceeded, а иначе
+    для доли запросов QUERY_BUDGET_SAMPLE_RATE в лог пишется
+    предупреждение с повторяющимися шаблонами SQL.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = RequestTiming(
+            capture_statements=settings.QUERY_BUDGET_RAISE
+            or random() < settings.QUERY_BUDGET_SAMPLE_RATE
+        )
+        request.view_name = None
+        request.query_budget = None
+        token = current_timing.set(timing)
+        try:
+            with connection.execute_wrapper(timing):
+                response = self.get_response(request)
+        finally:
+            current_timing.reset(token)
+        total_time = timing.total_time
+        metrics_registry.observe(
+            request.view_name or "unresolved",
+            {
+                "foodgram_request_duration_seconds": total_time,
+                "foodgram_request_db_seconds": timing.db_time,
+                "foodgram_request_serializer_seconds": (
+                    timing.serializer_time
+                ),
+                "foodgram_request_queries": timing.queries,
+            },
+        )
+        if self.is_timing_visible(request):
+            response["Server-Timing"] = (
+                f'db;dur={timing.db_time * 1000:.1f};'
+                f'desc="SQL: {timing.queries}", '
+                f"serializer;dur={timing.serializer_time * 1000:.1f}, "
+                f"total;dur={total_time * 1000:.1f}"
+            )
+        self.check_query_budget(request, timing)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.view_name = get_view_name(request, view_func)
+        request.query_budget = get_query_budget(request, view_func)
+
+    def check_query_budget(self, request, timing):
+        budget = resolve_query_budget(
+            request.query_budget, getattr(request, "user", None)
+        )
+        if (
+            budget is None
+            or timing.queries <= budget
+            or timing.statements is None
+        ):
+            return
+        message = (
+            f"{request.view_name}: {timing.queries} SQL-запросов "
+            f"при бюджете {budget}."
+        )
+        repeated = get_repeated_queries(timing.statements)
+        if repeated:
+            message += "\nПовторяющиеся запросы:\n" + "\n".join(
+                f"{count} × {fingerprint}" for fingerprint, count in repeated
+            )
+        if settings.QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+    def is_timing_visible(self, request):
+        user = getattr(request, "user", None)
+        return (
+            settings.DEBUG
+            or (user is not None and user.is_staff)
+            or has_metrics_token(request, "X-Server-Timing")
+        )
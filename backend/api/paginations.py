@@ -1,5 +1,183 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+
+from django.db.models import Count, Q, Window
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination,
+    PageNumberPagination,
+    _positive_int,
+)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Постраничный вывод по ключу последней показанной записи.
+
+    Ключ состоит из полей сортировки выборки, дополненных id, и
+    передаётся в параметре cursor. Страница выбирается условием на
+    ключ, поэтому не требует ни OFFSET, ни подсчёта всех записей.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "limit"
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = "Неверный курсор."
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, queryset):
+        ordering = list(
+            queryset.query.order_by or queryset.model._meta.ordering
+        )
+        if not {"id", "-id", "pk", "-pk"} & set(ordering):
+            ordering.append("id")
+        return ordering
+
+    def encode_cursor(self, key, reverse):
+        data = json.dumps({"key": key, "reverse": reverse}).encode()
+        return urlsafe_b64encode(data).decode()
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            cursor = json.loads(urlsafe_b64decode(token.encode()))
+            return list(cursor["key"]), bool(cursor["reverse"])
+        except (DecodeError, KeyError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_key(self, instance):
+        return [
+            getattr(instance, field.lstrip("-")) for field in self.ordering
+        ]
+
+    def get_key_filter(self, key, reverse):
+        condition = None
+        for field, value in reversed(list(zip(self.ordering, key))):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") != reverse else "gt"
+            after = Q(**{f"{name}__{lookup}": value})
+            condition = after if condition is None else (
+                after | Q(**{name: value}) & condition
+            )
+        return condition
+
+    def get_page_queryset(self, queryset, request):
+        """Получить запрос записей страницы и одной записи после неё."""
+        self.request = request
+        self.ordering = self.get_ordering(queryset)
+        self.limit = self.get_page_size(request)
+        self.key, self.reverse = self.decode_cursor(request)
+        if self.key is not None and len(self.key) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [
+                field[1:] if field.startswith("-") else f"-{field}"
+                for field in ordering
+            ]
+        queryset = queryset.order_by(*ordering)
+        if self.key is not None:
+            queryset = queryset.filter(
+                self.get_key_filter(self.key, self.reverse)
+            )
+        return queryset[:self.limit + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        results = list(self.get_page_queryset(queryset, request))
+        key, reverse = self.key, self.reverse
+        has_more = len(results) > self.limit
+        results = results[:self.limit]
+        if reverse:
+            results.reverse()
+
+        self.next_key = self.previous_key = None
+        if results and (has_more or reverse):
+            self.next_key = self.get_key(results[-1])
+        if results and (has_more if reverse else key is not None):
+            self.previous_key = self.get_key(results[0])
+        return results
+
+    def get_link(self, key, reverse):
+        if key is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(key, reverse),
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_link(self.next_key, False),
+            "previous": self.get_link(self.previous_key, True),
+            "results": data,
+        })
 
 
 class PageSizeLimitPagination(PageNumberPagination):
+    """Постраничный вывод с параметрами page и limit.
+
+    Если в запросе передан параметр cursor (для первой страницы —
+    пустой), выборка разбивается на страницы по ключу.
+    """
+
     page_size_query_param = 'limit'
+    keyset_pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_pagination = None
+        if self.keyset_pagination_class.cursor_query_param in (
+            request.query_params
+        ):
+            self.keyset_pagination = self.keyset_pagination_class()
+            return self.keyset_pagination.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_page_queryset(self, queryset, request):
+        """Получить запрос записей страницы без отдельного подсчёта.
+
+        Общее число записей добавляется к каждой строке страницы
+        оконной функцией. Если номер страницы без подсчёта неизвестен
+        или неверен, возвращается None.
+        """
+        if self.keyset_pagination_class.cursor_query_param in (
+            request.query_params
+        ):
+            return self.keyset_pagination_class().get_page_queryset(
+                queryset, request
+            )
+        page_size = self.get_page_size(request)
+        try:
+            number = _positive_int(
+                request.query_params.get(self.page_query_param, 1),
+                strict=True,
+            )
+        except ValueError:
+            return None
+        if not page_size:
+            return None
+        start = (number - 1) * page_size
+        return queryset.annotate(
+            total=Window(Count("pk"))
+        )[start:start + page_size]
+
+    def get_paginated_response(self, data):
+        if self.keyset_pagination:
+            return self.keyset_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
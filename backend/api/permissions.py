@@ -17,3 +17,17 @@ class IsAdminAuthorOrReadOnly(permissions.BasePermission):
             or request.user.is_staff
             or request.user.is_superuser
         )
+
+
+class IsAdminOrAuthor(permissions.BasePermission):
+    """Доступ только для автора и администратора."""
+
+    def has_permission(self, request, view):
+        return request.user.is_authenticated
+
+    def has_object_permission(self, request, view, obj):
+        return (
+            obj.author == request.user
+            or request.user.is_staff
+            or request.user.is_superuser
+        )
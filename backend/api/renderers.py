@@ -0,0 +1,224 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+SHOPPING_CART_TITLE = "Список покупок:"
+CYRILLIC_ALPHABET = "АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ"
+
+
+def shopping_cart_line(row):
+    return (
+        f'{row["name"]}: '
+        f'{row["total_amount"]}/{row["measurement_unit"]}.'
+    )
+
+
+class Echo:
+    """Буфер, сразу возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingCartRenderer(BaseRenderer):
+    """Базовый рендерер списка покупок.
+
+    Строки списка выдаются генератором stream() по мере чтения
+    из базы, render() используется только для ответов с ошибками.
+    """
+
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+    def stream(self, rows):
+        raise NotImplementedError
+
+
+class ShoppingCartTextRenderer(ShoppingCartRenderer):
+    """Список покупок в текстовом формате."""
+
+    media_type = "text/plain"
+    format = "txt"
+
+    def stream(self, rows):
+        yield f"{SHOPPING_CART_TITLE} \n\n"
+        for row in rows:
+            yield f"{shopping_cart_line(row)}\n"
+
+
+class ShoppingCartCSVRenderer(ShoppingCartRenderer):
+    """Список покупок в формате CSV."""
+
+    media_type = "text/csv"
+    format = "csv"
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ("Ингредиент", "Единица измерения", "Количество")
+        )
+        for row in rows:
+            yield writer.writerow(
+                (row["name"], row["measurement_unit"], row["total_amount"])
+            )
+
+
+class ShoppingCartJSONRenderer(ShoppingCartRenderer):
+    """Список покупок в формате JSON."""
+
+    media_type = "application/json"
+    format = "json"
+
+    def stream(self, rows):
+        separator = "["
+        for row in rows:
+            yield separator + json.dumps(
+                {
+                    "name": row["name"],
+                    "measurement_unit": row["measurement_unit"],
+                    "amount": row["total_amount"],
+                },
+                ensure_ascii=False,
+            )
+            separator = ","
+        yield "]" if separator == "," else "[]"
+
+
+class ShoppingCartPDFRenderer(ShoppingCartRenderer):
+    """Список покупок в формате PDF.
+
+    Документ пишется постранично: каждая страница отдаётся клиенту,
+    как только набрано нужное число строк, а таблица xref с
+    накопленными смещениями объектов выводится в конце.
+    Используется встроенный в просмотрщики моноширинный шрифт
+    в кодировке cp1251, поэтому ширины символов известны заранее.
+    """
+
+    media_type = "application/pdf"
+    format = "pdf"
+    charset = None
+
+    encoding = "cp1251"
+    page_width = 595
+    page_height = 842
+    margin = 50
+    font_size = 11
+    leading = 16
+
+    def lines_per_page(self):
+        return (self.page_height - 2 * self.margin) // self.leading
+
+    def escape(self, text):
+        data = text.encode(self.encoding, errors="replace")
+        return (
+            data.replace(b"\\", b"\\\\")
+            .replace(b"(", b"\\(")
+            .replace(b")", b"\\)")
+        )
+
+    def font_differences(self):
+        names = []
+        for code in range(128, 256):
+            try:
+                char = bytes([code]).decode(self.encoding)
+            except UnicodeDecodeError:
+                continue
+            if char in CYRILLIC_ALPHABET:
+                name = f"afii{10017 + CYRILLIC_ALPHABET.index(char)}"
+            elif char in CYRILLIC_ALPHABET.lower():
+                name = f"afii{10065 + CYRILLIC_ALPHABET.lower().index(char)}"
+            else:
+                name = f"uni{ord(char):04X}"
+            names.append(f"{code} /{name}")
+        return " ".join(names).encode()
+
+    def page_content(self, lines):
+        content = b"BT /F1 %d Tf %d TL %d %d Td" % (
+            self.font_size,
+            self.leading,
+            self.margin,
+            self.page_height - self.margin,
+        )
+        for line in lines:
+            content += b" (" + self.escape(line) + b") Tj T*"
+        return content + b" ET"
+
+    def stream(self, rows):
+        offsets = {}
+        position = 0
+        page_ids = []
+
+        def write(number, body):
+            nonlocal position
+            offsets[number] = position
+            chunk = b"%d 0 obj\n" % number + body + b"\nendobj\n"
+            position += len(chunk)
+            return chunk
+
+        def write_page(lines):
+            content_id = 5 + 2 * len(page_ids)
+            page_id = content_id + 1
+            page_ids.append(page_id)
+            content = self.page_content(lines)
+            return write(
+                content_id,
+                b"<< /Length %d >>\nstream\n" % len(content)
+                + content
+                + b"\nendstream",
+            ) + write(
+                page_id,
+                b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+                b"/Resources << /Font << /F1 3 0 R >> >> "
+                b"/Contents %d 0 R >>"
+                % (self.page_width, self.page_height, content_id),
+            )
+
+        header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        position += len(header)
+        yield header
+        yield write(
+            3,
+            b"<< /Type /Font /Subtype /TrueType /BaseFont /CourierNewPSMT "
+            b"/FirstChar 32 /LastChar 255 /Widths [%s] "
+            b"/FontDescriptor 4 0 R /Encoding << /Type /Encoding "
+            b"/BaseEncoding /WinAnsiEncoding /Differences [%s] >> >>"
+            % (b" ".join([b"600"] * 224), self.font_differences()),
+        )
+        yield write(
+            4,
+            b"<< /Type /FontDescriptor /FontName /CourierNewPSMT /Flags 33 "
+            b"/FontBBox [-21 -680 638 1021] /ItalicAngle 0 /Ascent 833 "
+            b"/Descent -300 /CapHeight 571 /StemV 109 >>",
+        )
+
+        lines = [SHOPPING_CART_TITLE, ""]
+        for row in rows:
+            lines.append(shopping_cart_line(row))
+            if len(lines) == self.lines_per_page():
+                yield write_page(lines)
+                lines = []
+        if lines or not page_ids:
+            yield write_page(lines)
+
+        yield write(
+            2,
+            b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+                b" ".join(b"%d 0 R" % page_id for page_id in page_ids),
+                len(page_ids),
+            ),
+        )
+        yield write(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        size = max(offsets) + 1
+        xref = b"xref\n0 %d\n0000000000 65535 f \n" % size
+        for number in range(1, size):
+            xref += b"%010d 00000 n \n" % offsets[number]
+        yield xref + (
+            b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (size, position)
+        )
@@ -0,0 +1,78 @@
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramSimilarity,
+)
+from django.db import connections
+from django.db.models import (
+    Case,
+    F,
+    FloatField,
+    IntegerField,
+    Q,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Lower
+
+SEARCH_CONFIG = "russian"
+
+
+class UnicodeLower(Lower):
+    """Перевод в нижний регистр с учётом кириллицы.
+
+    Встроенные LOWER и LIKE в SQLite меняют регистр только у латиницы,
+    поэтому там используется функция unicode_lower, которую
+    регистрирует api.signals.register_sqlite_functions.
+    """
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection, function="unicode_lower", **extra_context
+        )
+
+
+def search_recipes_postgresql(queryset, value):
+    """Полнотекстовый поиск с запасным нечётким поиском по названию.
+
+    Используются GIN-индексы по search_vector и по триграммам
+    названия, поэтому оба условия обходятся без полного сканирования.
+    Релевантность приводится к double precision: значение real после
+    передачи в курсоре через JSON иначе не совпадает с исходным, и
+    при равной релевантности записи пропускаются или повторяются.
+    """
+    query = SearchQuery(value, config=SEARCH_CONFIG, search_type="websearch")
+    return queryset.filter(
+        Q(search_vector=query) | Q(name__trigram_similar=value)
+    ).annotate(
+        rank=Cast(
+            SearchRank(F("search_vector"), query)
+            + TrigramSimilarity("name", value),
+            FloatField(),
+        )
+    ).order_by("-rank", "name", "id")
+
+
+def search_recipes_simple(queryset, value):
+    """Поиск по вхождению подстроки для остальных СУБД."""
+    value = value.lower()
+    return queryset.annotate(
+        name_lower=UnicodeLower("name"),
+        text_lower=UnicodeLower("text"),
+    ).filter(
+        Q(name_lower__contains=value) | Q(text_lower__contains=value)
+    ).annotate(
+        rank=Case(
+            When(name_lower__startswith=value, then=Value(2)),
+            When(name_lower__contains=value, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    ).order_by("-rank", "name", "id")
+
+
+def search_recipes(queryset, value):
+    """Отфильтровать рецепты по запросу и упорядочить по релевантности."""
+    if connections[queryset.db].vendor == "postgresql":
+        return search_recipes_postgresql(queryset, value)
+    return search_recipes_simple(queryset, value)
@@ -1,14 +1,24 @@
-import random
-import string
+from collections import Counter
 
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.validators import UniqueTogetherValidator
-from django.core.exceptions import ObjectDoesNotExist
 
-from api.fields import Base64ImageField
-from recipes.constants import MIN_VALUE, MAX_VALUE
+from api.fields import (
+    Base64ImageField,
+    RenditionImageField,
+    RenditionsField,
+)
+from api.helpers import get_recipes_limit
+from api.metrics import TimedRepresentationMixin
+from recipes.constants import (
+    MAX_BULK_RECIPES,
+    MIN_VALUE,
+    MAX_VALUE,
+    RECIPE_CARD_WIDTH,
+)
 from recipes.models import (
     User,
     Ingredient,
@@ -17,23 +27,36 @@ from recipes.models import (
     RecipeIngredient,
     Favorite,
     ShoppingCart,
+    ShoppingCartIngredient,
     Subscription,
     ShortLink,
+    change_counter,
 )
 
 
-class UserGetSerializer(UserSerializer):
+class UserGetSerializer(TimedRepresentationMixin, UserSerializer):
     """Сериализатор получения информации о пользователе."""
 
     is_subscribed = serializers.SerializerMethodField()
     avatar = Base64ImageField(required=False)
+    avatar_renditions = RenditionsField("avatar", "avatar_renditions")
+
+    def get_subscribed_ids(self):
+        """Получить id авторов, на которых подписан пользователь.
+
+        Множество загружается один раз и хранится в контексте,
+        общем для всех вложенных сериализаторов запроса.
+        """
+        if "subscribed_ids" not in self.context:
+            user = self.context["request"].user
+            self.context["subscribed_ids"] = (
+                set(user.follower.values_list("author_id", flat=True))
+                if user.is_authenticated else set()
+            )
+        return self.context["subscribed_ids"]
 
     def get_is_subscribed(self, obj):
-        user = self.context["request"].user
-        return (
-            user.is_authenticated
-            and Subscription.objects.filter(user=user, author=obj).exists()
-        )
+        return obj.id in self.get_subscribed_ids()
 
     def create(self, validated_data):
         avatar_data = validated_data.pop("avatar", None)
@@ -59,6 +82,7 @@ class UserGetSerializer(UserSerializer):
             "last_name",
             "is_subscribed",
             "avatar",
+            "avatar_renditions",
         )
 
 
@@ -67,23 +91,19 @@ class UserSubscribeRepresentSerializer(UserGetSerializer):
 
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     def get_recipes(self, obj):
         request = self.context.get("request")
-        recipes_limit = None
-        if request:
-            recipes_limit = request.query_params.get("recipes_limit")
-        recipes = obj.recipes.all()
-        if recipes_limit:
-            recipes = obj.recipes.all()[: int(recipes_limit)]
+        recipes = getattr(obj, "limited_recipes", None)
+        if recipes is None:
+            recipes = obj.recipes.all()
+            recipes_limit = request and get_recipes_limit(request)
+            if recipes_limit:
+                recipes = recipes[:recipes_limit]
         return RecipeShortSerializer(
             recipes, many=True, context={"request": request}
         ).data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
     class Meta:
         model = User
         fields = (
@@ -95,6 +115,7 @@ class UserSubscribeRepresentSerializer(UserGetSerializer):
             "is_subscribed",
             "recipes",
             "recipes_count",
+            "followers_count",
         )
         read_only_fields = (
             "email",
@@ -104,6 +125,7 @@ class UserSubscribeRepresentSerializer(UserGetSerializer):
             "is_subscribed",
             "recipes",
             "recipes_count",
+            "followers_count",
         )
 
 
@@ -142,6 +164,14 @@ class UserSubscribeSerializer(serializers.ModelSerializer):
             )
         return data
 
+    def create(self, validated_data):
+        subscription = super().create(validated_data)
+        change_counter(
+            User.objects.filter(pk=subscription.author_id), "followers_count"
+        )
+        subscription.author.refresh_from_db(fields=["followers_count"])
+        return subscription
+
     def to_representation(self, instance):
         request = self.context.get("request")
         return UserSubscribeRepresentSerializer(
@@ -171,7 +201,7 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         )
 
 
-class TagGetSerializer(serializers.ModelSerializer):
+class TagGetSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     """Сериализатор получения информации о тегах."""
 
     class Meta:
@@ -179,7 +209,9 @@ class TagGetSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(
+    TimedRepresentationMixin, serializers.ModelSerializer
+):
     """Сериализатор работы с ингредиентами."""
 
     class Meta:
@@ -187,7 +219,9 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class RecipeGetSerializer(serializers.ModelSerializer):
+class RecipeGetSerializer(
+    TimedRepresentationMixin, serializers.ModelSerializer
+):
     """Сериализатор получения информации о рецептах."""
 
     tags = TagGetSerializer(many=True, read_only=True)
@@ -197,40 +231,35 @@ class RecipeGetSerializer(serializers.ModelSerializer):
         read_only=True,
         source="recipe_ingredients",
     )
-    is_favorited = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.SerializerMethodField()
-
-    def get_is_favorited(self, obj):
-        """Проверить наличие рецепта в избранном."""
-        request = self.context.get("request")
-        return (
-            request
-            and request.user.is_authenticated
-            and Favorite.objects.filter(
-                user=request.user,
-                recipe=obj
-            ).exists()
-        )
-
-    def get_is_in_shopping_cart(self, obj):
-        """Проверить наличие рецепта в списке покупок."""
-        request = self.context.get("request")
-        return (
-            request
-            and request.user.is_authenticated
-            and ShoppingCart.objects.filter(
-                user=request.user,
-                recipe=obj
-            ).exists()
-        )
+    is_favorited = serializers.BooleanField(read_only=True)
+    is_in_shopping_cart = serializers.BooleanField(read_only=True)
+    image_renditions = RenditionsField("image", "image_renditions")
 
     class Meta:
         model = Recipe
-        fields = "__all__"
-        extra_fields = ("is_favorited", "is_in_shopping_cart")
+        fields = (
+            "id",
+            "tags",
+            "author",
+            "ingredients",
+            "is_favorited",
+            "is_in_shopping_cart",
+            "favorites_count",
+            "name",
+            "text",
+            "cooking_time",
+            "image",
+            "image_renditions",
+        )
         read_only_fields = ('id', 'author',)
 
 
+class RecipeListSerializer(RecipeGetSerializer):
+    """Сериализатор рецептов в списке с уменьшенным изображением."""
+
+    image = RenditionImageField("image", "image_renditions", RECIPE_CARD_WIDTH)
+
+
 class IngredientPostSerializer(serializers.ModelSerializer):
     """Сериализатор добавления ингредиентов."""
 
@@ -263,9 +292,16 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     )
 
     def validate(self, data):
-        if not data.get("tags"):
+        """Проверить наличие тегов и ингредиентов.
+
+        При частичном обновлении проверяются только переданные поля.
+        """
+        if (not self.partial or "tags" in data) and not data.get("tags"):
             raise ValidationError("Рецепт не может быть без тега!")
-        if not data.get("ingredients"):
+        if (
+            (not self.partial or "recipe_ingredients" in data)
+            and not data.get("recipe_ingredients")
+        ):
             raise ValidationError("Рецепт не может быть без ингредиентов.")
         return data
 
@@ -275,55 +311,120 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         return tags
 
     def validate_ingredients(self, ingredients):
-        ingredients_list = []
+        """Проверить ингредиенты одним запросом.
+
+        Найденные объекты сохраняются в данных под ключом ingredient
+        и используются при создании связей с рецептом.
+        """
+        ids = Counter(item["id"] for item in ingredients)
+        duplicates = sorted(id for id, count in ids.items() if count > 1)
+        if duplicates:
+            raise ValidationError(
+                "Ингредиенты должны быть уникальными! Повторяются id: "
+                + ", ".join(map(str, duplicates))
+            )
+        found = Ingredient.objects.in_bulk(ids)
+        missing = sorted(ids.keys() - found.keys())
+        if missing:
+            raise ValidationError(
+                "Указанных ингредиентов не существует: id "
+                + ", ".join(map(str, missing))
+            )
         for item in ingredients:
-            try:
-                ingredient = Ingredient.objects.get(id=item["id"])
-            except Ingredient.DoesNotExist:
-                raise ValidationError("Указанного ингридиента не существует!")
-
-            if ingredient in ingredients_list:
-                raise ValidationError("Ингредиенты должны быть уникальными!")
-
-            ingredients_list.append(ingredient)
+            item["ingredient"] = found[item["id"]]
         return ingredients
 
     def create_ingredients(self, recipe, ingredients_data):
         new_ingredients = [
             RecipeIngredient(
                 recipe=recipe,
-                ingredient_id=item.get("id"),
+                ingredient=item["ingredient"],
                 amount=item["amount"]
             ) for item in ingredients_data
         ]
         RecipeIngredient.objects.bulk_create(new_ingredients)
 
+    @transaction.atomic
     def create(self, validated_data):
         request = self.context.get("request")
         ingredients_data = validated_data.pop("recipe_ingredients")
         tags_data = validated_data.pop("tags")
 
         recipe = Recipe.objects.create(author=request.user, **validated_data)
+        change_counter(
+            User.objects.filter(pk=request.user.pk), "recipes_count"
+        )
         recipe.tags.set(tags_data)
 
         self.create_ingredients(recipe, ingredients_data)
 
         return recipe
 
-    def update(self, instance, validated_data):
-        tags = validated_data.pop("tags")
-        ingredients = validated_data.pop("recipe_ingredients")
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        instance.tags.clear()
-        instance.tags.set(tags)
-
-        super().update(instance, validated_data)
-
-        self.create_ingredients(instance, ingredients)
+    def update_tags(self, recipe, tags):
+        """Добавить новые и удалить лишние теги рецепта."""
+        old_ids = {tag.id for tag in recipe.tags.all()}
+        new_ids = {tag.id for tag in tags}
+        if old_ids - new_ids:
+            recipe.tags.remove(*(old_ids - new_ids))
+        if new_ids - old_ids:
+            recipe.tags.add(*(new_ids - old_ids))
+
+    def update_ingredients(self, recipe, ingredients_data):
+        """Применить к ингредиентам рецепта только изменения.
+
+        Удаляются исчезнувшие ингредиенты, добавляются новые и
+        обновляется количество изменившихся. Удаление учитывается в
+        списках покупок сигналами, а массовые изменение и добавление,
+        которые сигналы не вызывают, учитываются отдельно.
+        """
+        old_items = {
+            item.ingredient_id: item
+            for item in recipe.recipe_ingredients.all()
+        }
+        new_items = {item["id"]: item for item in ingredients_data}
+        old_amounts = {
+            id: old_items[id].amount
+            for id in old_items.keys() & new_items.keys()
+        }
+        removed = old_items.keys() - new_items.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                pk__in=[old_items[id].pk for id in removed]
+            ).delete()
+        changed = []
+        for id in old_items.keys() & new_items.keys():
+            item = old_items[id]
+            if item.amount != new_items[id]["amount"]:
+                item.amount = new_items[id]["amount"]
+                changed.append(item)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ["amount"])
+        added = new_items.keys() - old_items.keys()
+        if added:
+            self.create_ingredients(
+                recipe, [new_items[id] for id in added]
+            )
+        ShoppingCartIngredient.objects.change_recipe(
+            recipe,
+            old_amounts,
+            {id: item["amount"] for id, item in new_items.items()},
+        )
 
-        return instance
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        tags = validated_data.pop("tags", None)
+        ingredients = validated_data.pop("recipe_ingredients", None)
+        if tags is not None:
+            self.update_tags(instance, tags)
+        if ingredients is not None:
+            self.update_ingredients(instance, ingredients)
+        return super().update(instance, validated_data)
 
     def to_representation(self, instance):
+        request = self.context.get("request")
+        instance = Recipe.objects.with_user_flags(request.user).get(
+            pk=instance.pk
+        )
         return RecipeGetSerializer(instance, context=self.context).data
 
     class Meta:
@@ -338,15 +439,21 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         )
 
 
-class RecipeShortSerializer(serializers.ModelSerializer):
+class RecipeShortSerializer(
+    TimedRepresentationMixin, serializers.ModelSerializer
+):
     """Сериализатор краткой информации о рецепте."""
 
+    image = RenditionImageField("image", "image_renditions", RECIPE_CARD_WIDTH)
+    image_renditions = RenditionsField("image", "image_renditions")
+
     class Meta:
         model = Recipe
         fields = (
             "id",
             "name",
             "image",
+            "image_renditions",
             "cooking_time",
         )
 
@@ -388,28 +495,27 @@ class ShoppingCartSerializer(FavoriteSerializer):
         ]
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    """Сериализатор списка id рецептов для групповых операций."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BULK_RECIPES,
+    )
+
+
 class ShortLinkSerializer(serializers.ModelSerializer):
     """Сериализатор коротких ссылок."""
 
-    def short_link(self):
-        characters = string.ascii_letters + string.digits
-        return "".join(random.choice(characters) for _ in range(10))
-
     def create(self, validated_data):
-        try:
-            return ShortLink.objects.get(
-                recipe_id=validated_data["recipe"].id,
-                full_link=validated_data["full_link"]
-            )
-        except ObjectDoesNotExist:
-            return ShortLink.objects.create(
-                recipe=validated_data["recipe"],
-                full_link=validated_data["full_link"],
-                short_link=self.short_link()
-            )
+        return ShortLink.objects.get_or_create(
+            recipe=validated_data["recipe"]
+        )[0]
 
     class Meta:
         model = ShortLink
-        fields = ("full_link", "recipe", "short_link")
-        read_only = ("short_link",)
-        write_only_fields = ("full_link", "recipe")
+        fields = ("recipe", "short_link")
+        extra_kwargs = {
+            "recipe": {"validators": [], "write_only": True},
+        }
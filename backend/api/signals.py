@@ -0,0 +1,178 @@
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.db import close_old_connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from api.cache import bump_version
+from api.counters import click_counter
+from api.helpers import get_short_link_cache_key
+from api.serializers import UserGetSerializer
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingCartIngredient,
+    ShortLink,
+    Tag,
+    User,
+)
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    bump_version("ingredients")
+
+
+@receiver(connection_created)
+def register_sqlite_functions(connection, **kwargs):
+    if connection.vendor == "sqlite":
+        connection.connection.create_function(
+            "unicode_lower",
+            1,
+            lambda value: value if value is None else value.lower(),
+            deterministic=True,
+        )
+
+
+@receiver(request_finished)
+def flush_short_link_clicks(**kwargs):
+    if click_counter.flush():
+        close_old_connections()
+
+
+@receiver([post_save, post_delete], sender=ShortLink)
+def invalidate_short_link(instance, **kwargs):
+    if instance.short_link:
+        cache.delete(get_short_link_cache_key(instance.short_link))
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_tag_registry(**kwargs):
+    bump_version("tags")
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+@receiver([post_save, post_delete], sender=Ingredient)
+@receiver([post_save, post_delete], sender=Tag)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_cache(**kwargs):
+    bump_version("recipes")
+
+
+AUTHOR_FIELDS = [
+    field
+    for field in User._meta.concrete_fields
+    if field.name in UserGetSerializer.Meta.fields and not field.primary_key
+]
+
+
+@receiver(pre_save, sender=User)
+def check_author_fields(instance, update_fields=None, **kwargs):
+    """Отметить, изменились ли поля автора, выводимые в рецептах."""
+    instance.author_fields_changed = False
+    if instance._state.adding:
+        return
+    fields = [
+        field for field in AUTHOR_FIELDS
+        if update_fields is None or field.name in update_fields
+    ]
+    if not fields:
+        return
+    saved = User.objects.filter(pk=instance.pk).values(
+        *(field.name for field in fields)
+    ).first()
+    instance.author_fields_changed = saved is None or any(
+        saved[field.name]
+        != field.get_prep_value(field.value_from_object(instance))
+        for field in fields
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_recipe_cache_for_user(instance, created, **kwargs):
+    if created or not getattr(instance, "author_fields_changed", True):
+        return
+    bump_version("recipes")
+    Recipe.objects.filter(author=instance).touch()
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def touch_recipe_ingredients(instance, **kwargs):
+    Recipe.objects.filter(pk=instance.recipe_id).touch()
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_cart_ingredients(instance, created, **kwargs):
+    if created:
+        ShoppingCartIngredient.objects.add_recipe(instance)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_cart_ingredients(instance, **kwargs):
+    """Вычесть рецепт, удалённый из списка покупок.
+
+    Вычитание выполняется после удаления строки. При каскадном удалении
+    рецепта каждую пару из строки списка и ингредиента рецепта вычитает
+    сигнал той строки, которая удалена первой, поэтому пара не
+    учитывается дважды.
+    """
+    ShoppingCartIngredient.objects.remove_recipe(instance)
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def remember_ingredient_amount(instance, **kwargs):
+    instance.saved_amounts = dict(
+        RecipeIngredient.objects.filter(pk=instance.pk).values_list(
+            "ingredient_id", "amount"
+        )
+    ) if instance.pk else {}
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def change_cart_ingredient(instance, **kwargs):
+    ShoppingCartIngredient.objects.change_recipe(
+        instance.recipe_id,
+        getattr(instance, "saved_amounts", {}),
+        {instance.ingredient_id: instance.amount},
+    )
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def remove_cart_ingredient(instance, **kwargs):
+    ShoppingCartIngredient.objects.change_recipe(
+        instance.recipe_id, {instance.ingredient_id: instance.amount}, {}
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+def touch_ingredient_recipes(instance, created, **kwargs):
+    if not created:
+        Recipe.objects.filter(ingredients=instance).touch()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_tag_recipes(instance, created=False, **kwargs):
+    if not created:
+        Recipe.objects.filter(tags=instance).touch()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def touch_tagged_recipes(instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            Recipe.objects.filter(pk=instance.pk).touch()
+    elif action in ("post_add", "post_remove"):
+        Recipe.objects.filter(pk__in=pk_set).touch()
+    elif action == "pre_clear":
+        Recipe.objects.filter(tags=instance).touch()
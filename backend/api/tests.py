@@ -0,0 +1,492 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.test import TestCase, override_settings
+from django.utils.http import http_date
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.budgets import QueryBudgetExceeded
+from api.cache import get_version
+from api.helpers import get_short_link_cache_key
+from api.search import search_recipes, search_recipes_simple
+from api.serializers import RecipeListSerializer
+from recipes.models import (
+    Favorite,
+    Recipe,
+    ShortLink,
+    Tag,
+    User,
+)
+
+
+class APITestCase(TestCase):
+    """Общие данные для тестов API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_user("author")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    @classmethod
+    def create_user(cls, username):
+        return User.objects.create_user(
+            email=f"{username}@example.com",
+            username=username,
+            first_name="Имя",
+            last_name="Фамилия",
+            password="password",
+        )
+
+    def get_client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    @classmethod
+    def create_recipe(cls, name, text="Описание", author=None):
+        return Recipe.objects.create(
+            name=name,
+            text=text,
+            author=author or cls.author,
+            cooking_time=10,
+            image="recipes/test.png",
+        )
+
+    def get_names(self, data):
+        return [recipe["name"] for recipe in data["results"]]
+
+
+class SimpleSearchTest(APITestCase):
+    """Поиск без PostgreSQL не зависит от регистра кириллицы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.create_recipe("Блюдо из тыквы")
+        cls.create_recipe("Летнее блюдо")
+        cls.create_recipe("Суп", text="Первое БЛЮДО к обеду")
+        cls.create_recipe("Каша")
+
+    def search(self, value):
+        return [
+            recipe.name
+            for recipe in search_recipes_simple(Recipe.objects.all(), value)
+        ]
+
+    def test_search_ignores_cyrillic_case(self):
+        expected = ["Блюдо из тыквы", "Летнее блюдо", "Суп"]
+        for value in ("блюдо", "Блюдо", "БЛЮДО"):
+            with self.subTest(value=value):
+                self.assertEqual(self.search(value), expected)
+
+    def test_search_ranks_name_prefix_first(self):
+        self.assertEqual(
+            self.search("БЛЮД"), ["Блюдо из тыквы", "Летнее блюдо", "Суп"]
+        )
+        self.assertEqual(self.search("летнее"), ["Летнее блюдо"])
+
+    def test_search_filter(self):
+        response = self.client.get("/api/recipes/", {"search": "блюдо"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 3)
+
+
+class KeysetPaginationTest(APITestCase):
+    """Постраничный вывод рецептов по курсору."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_author = cls.create_user("other")
+        for name in ("Борщ", "Вареники", "Вареники", "Вареники", "Пирог"):
+            cls.create_recipe(name)
+        cls.create_recipe("Вареники", author=cls.other_author)
+        cls.expected = list(
+            Recipe.objects.order_by("name", "id").values_list("id", flat=True)
+        )
+
+    def get_ids(self, data):
+        return [recipe["id"] for recipe in data["results"]]
+
+    def walk(self, url, params=None):
+        """Пройти страницы вперёд по ссылкам next, затем назад."""
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data["previous"])
+        pages = [response.data]
+        limit = Recipe.objects.count()
+        while pages[-1]["next"] and len(pages) <= limit:
+            pages.append(self.client.get(pages[-1]["next"]).data)
+        backward = [pages[-1]]
+        while backward[-1]["previous"] and len(backward) <= limit:
+            backward.append(self.client.get(backward[-1]["previous"]).data)
+        return pages, backward[::-1]
+
+    def test_next_and_previous_links(self):
+        pages, backward = self.walk(
+            "/api/recipes/", {"cursor": "", "limit": 2}
+        )
+        self.assertNotIn("count", pages[0])
+        self.assertEqual(
+            [self.get_ids(page) for page in pages],
+            [self.expected[:2], self.expected[2:4], self.expected[4:]],
+        )
+        self.assertEqual(
+            [self.get_ids(page) for page in backward],
+            [self.get_ids(page) for page in pages],
+        )
+
+    def test_equal_names_are_split_by_id(self):
+        pages, _ = self.walk("/api/recipes/", {"cursor": "", "limit": 1})
+        ids = [self.get_ids(page)[0] for page in pages]
+        self.assertEqual(ids, self.expected)
+        self.assertEqual(
+            [page["results"][0]["name"] for page in pages[1:5]],
+            ["Вареники"] * 4,
+        )
+
+    def test_filter_with_cursor(self):
+        pages, backward = self.walk(
+            "/api/recipes/",
+            {"cursor": "", "limit": 2, "author": self.author.id},
+        )
+        expected = list(
+            Recipe.objects.filter(author=self.author).order_by(
+                "name", "id"
+            ).values_list("id", flat=True)
+        )
+        self.assertEqual(
+            [recipe for page in pages for recipe in self.get_ids(page)],
+            expected,
+        )
+        self.assertTrue(
+            all(f"author={self.author.id}" in page["next"]
+                for page in pages[:-1])
+        )
+        self.assertEqual(len(backward), len(pages))
+
+    def test_search_with_cursor(self):
+        """Равная релевантность не теряет и не повторяет записи."""
+        for number in range(5):
+            self.create_recipe(f"Суп {number}", text="Суп на обед")
+        self.create_recipe("Щи", text="Суп из капусты")
+        expected = [
+            recipe.id
+            for recipe in search_recipes(Recipe.objects.all(), "суп")
+        ]
+        pages, backward = self.walk(
+            "/api/recipes/", {"cursor": "", "limit": 2, "search": "суп"}
+        )
+        for walked in (pages, backward):
+            self.assertEqual(
+                [recipe for page in walked for recipe in self.get_ids(page)],
+                expected,
+            )
+
+    def test_page_number_pagination_without_cursor(self):
+        response = self.client.get("/api/recipes/", {"limit": 2, "page": 2})
+        self.assertEqual(response.data["count"], len(self.expected))
+        self.assertEqual(self.get_ids(response.data), self.expected[2:4])
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/recipes/", {"cursor": "invalid"})
+        self.assertEqual(response.status_code, 404)
+
+
+class AuthorCacheInvalidationTest(APITestCase):
+    """Кэш рецептов сбрасывается только при изменении полей автора."""
+
+    def assertRecipesVersionChanged(self, changed, action):
+        version = get_version("recipes")
+        action()
+        self.assertEqual(get_version("recipes") != version, changed)
+
+    def test_sign_up_keeps_cache(self):
+        self.assertRecipesVersionChanged(
+            False,
+            lambda: self.create_user("new"),
+        )
+
+    def test_unrelated_fields_keep_cache(self):
+        def change_password():
+            self.author.set_password("new-password")
+            self.author.save()
+
+        self.assertRecipesVersionChanged(False, change_password)
+        self.assertRecipesVersionChanged(False, self.author.save)
+
+    def test_author_fields_reset_cache(self):
+        def rename():
+            self.author.first_name = "Новое имя"
+            self.author.save(update_fields=["first_name"])
+
+        self.assertRecipesVersionChanged(True, rename)
+
+
+class RecipeResponseCacheTest(APITestCase):
+    """Ключи кэша ответов допустимы для memcached."""
+
+    def test_long_search_key(self):
+        self.create_recipe("Борщ")
+        params = {"search": "борщ со сметаной " * 5}
+        with mock.patch.object(
+            LocMemCache, "validate_key", BaseMemcachedCache.validate_key
+        ):
+            for _ in range(2):
+                response = self.client.get("/api/recipes/", params)
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 0)
+
+
+class ConditionalGetTest(APITestCase):
+    """ETag и ответы 304 для списка и детальной страницы рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.reader = cls.create_user("reader")
+        cls.recipes = [
+            cls.create_recipe(f"Рецепт {number}") for number in range(3)
+        ]
+
+    def get_etag(self, client, url):
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def test_list_not_modified(self):
+        url = "/api/recipes/?limit=2"
+        etag = self.get_etag(self.client, url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_list_not_modified_without_building_page(self):
+        url = "/api/recipes/?limit=2"
+        etag = self.get_etag(self.client, url)
+        cache.clear()
+        with mock.patch.object(
+            RecipeListSerializer, "to_representation"
+        ) as to_representation, self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        to_representation.assert_not_called()
+
+    def test_list_last_modified(self):
+        response = self.client.get("/api/recipes/?limit=2")
+        self.assertEqual(
+            response["Last-Modified"],
+            http_date(
+                max(recipe.updated_at for recipe in self.recipes).timestamp()
+            ),
+        )
+
+    def test_list_etag_follows_count(self):
+        url = "/api/recipes/?limit=1"
+        etag = self.get_etag(self.client, url)
+        self.create_recipe("Рецепт 9")
+        self.assertNotEqual(self.get_etag(self.client, url), etag)
+
+    def test_list_etag_follows_served_page(self):
+        url = "/api/recipes/?limit=2"
+        etag = self.get_etag(self.client, url)
+        reader = self.get_client(self.reader)
+        reader.post(f"/api/recipes/{self.recipes[2].id}/favorite/")
+        self.assertEqual(self.get_etag(self.client, url), etag)
+        reader.post(f"/api/recipes/{self.recipes[0].id}/favorite/")
+        self.assertNotEqual(self.get_etag(self.client, url), etag)
+
+    def test_list_etag_depends_on_user_flags(self):
+        url = "/api/recipes/?limit=2"
+        reader = self.get_client(self.reader)
+        etag = self.get_etag(reader, url)
+        reader.post(f"/api/recipes/{self.recipes[1].id}/shopping_cart/")
+        self.assertNotEqual(self.get_etag(reader, url), etag)
+
+    def test_recipe_not_modified(self):
+        url = f"/api/recipes/{self.recipes[0].id}/"
+        reader = self.get_client(self.reader)
+        etag = self.get_etag(reader, url)
+        with self.assertNumQueries(1):
+            response = reader.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.get_client(self.author).post(
+            f"/api/recipes/{self.recipes[1].id}/favorite/"
+        )
+        self.assertEqual(self.get_etag(reader, url), etag)
+        reader.post(f"/api/users/{self.author.id}/subscribe/")
+        self.assertNotEqual(self.get_etag(reader, url), etag)
+
+    def test_recipe_if_modified_since_is_ignored(self):
+        url = f"/api/recipes/{self.recipes[0].id}/"
+        response = self.client.get(url)
+        self.get_client(self.reader).post(f"{url}favorite/")
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["favorites_count"], 1)
+
+    def test_missing_recipe(self):
+        for pk in (0, "missing"):
+            with self.subTest(pk=pk):
+                response = self.client.get(f"/api/recipes/{pk}/")
+                self.assertEqual(response.status_code, 404)
+
+
+class ShortLinkRedirectTest(APITestCase):
+    """Переадресация по коротким ссылкам через общий кэш."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.recipe = cls.create_recipe("Суп")
+        cls.other_recipe = cls.create_recipe("Каша")
+
+    def setUp(self):
+        super().setUp()
+        self.link = ShortLink.objects.create(recipe=self.recipe)
+        self.url = f"/s/{self.link.short_link}/"
+
+    def test_redirect_is_cached(self):
+        response = self.client.get(self.url)
+        self.assertRedirects(
+            response, f"/recipes/{self.recipe.id}",
+            fetch_redirect_response=False,
+        )
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+    def test_changed_link_leaves_cache(self):
+        self.client.get(self.url)
+        self.link.recipe = self.other_recipe
+        self.link.save()
+        self.assertIsNone(
+            cache.get(get_short_link_cache_key(self.link.short_link))
+        )
+        self.assertRedirects(
+            self.client.get(self.url), f"/recipes/{self.other_recipe.id}",
+            fetch_redirect_response=False,
+        )
+
+    def test_deleted_link_leaves_cache(self):
+        self.client.get(self.url)
+        self.recipe.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_unknown_link(self):
+        for short_link in ("zzzz", "не-ссылка"):
+            with self.subTest(short_link=short_link):
+                response = self.client.get(f"/s/{short_link}/")
+                self.assertEqual(response.status_code, 404)
+
+
+class SubscriptionCountersTest(APITestCase):
+    """Счётчики в ответах сразу после их изменения."""
+
+    def test_subscribe_returns_current_followers_count(self):
+        for username in ("first", "second"):
+            reader = self.get_client(self.create_user(username))
+            response = reader.post(f"/api/users/{self.author.id}/subscribe/")
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["followers_count"], 2)
+        response = reader.get("/api/users/subscriptions/")
+        self.assertEqual(response.data["results"][0]["followers_count"], 2)
+        reader.delete(f"/api/users/{self.author.id}/subscribe/")
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 1)
+
+
+class QueryBudgetTest(APITestCase):
+    """Бюджеты SQL-запросов представлений."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.reader = cls.create_user("reader")
+        cls.token = Token.objects.create(user=cls.reader)
+        tag = Tag.objects.create(name="Обед", color="#00FF00", slug="lunch")
+        cls.recipes = [
+            cls.create_recipe(f"Рецепт {number}") for number in range(12)
+        ]
+        for recipe in cls.recipes:
+            recipe.tags.add(tag)
+        for recipe in cls.recipes[::2]:
+            Favorite.objects.create(user=cls.reader, recipe=recipe)
+
+    def get_clients(self):
+        reader = APIClient()
+        reader.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        return {"anonymous": self.client, "authenticated": reader}
+
+    def test_endpoints_within_budgets(self):
+        urls = [
+            "/api/recipes/?limit=6",
+            "/api/recipes/?limit=12&tags=lunch",
+            "/api/recipes/?limit=6&cursor=",
+            f"/api/recipes/{self.recipes[0].id}/",
+            "/api/users/?limit=6",
+            f"/api/users/{self.author.id}/",
+            "/api/tags/",
+            "/api/ingredients/",
+        ]
+        for who, client in self.get_clients().items():
+            for url in urls:
+                with self.subTest(who=who, url=url):
+                    cache.clear()
+                    self.assertEqual(client.get(url).status_code, 200)
+                    self.assertEqual(client.get(url).status_code, 200)
+        reader = self.get_clients()["authenticated"]
+        for url in (
+            "/api/recipes/?limit=6&is_favorited=1",
+            "/api/users/subscriptions/",
+            "/api/users/me/",
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(reader.get(url).status_code, 200)
+
+    def query_per_recipe(self):
+        """Добавить сериализатору списка по запросу на каждый рецепт."""
+        to_representation = RecipeListSerializer.to_representation
+
+        def with_query(serializer, instance):
+            Recipe.objects.filter(pk=instance.pk).exists()
+            return to_representation(serializer, instance)
+
+        return mock.patch.object(
+            RecipeListSerializer, "to_representation", with_query
+        )
+
+    def test_n_plus_one_raises(self):
+        for who, client in self.get_clients().items():
+            with self.subTest(who=who), self.query_per_recipe():
+                cache.clear()
+                with self.assertRaises(QueryBudgetExceeded) as context:
+                    client.get("/api/recipes/?limit=6")
+                message = str(context.exception)
+                self.assertTrue(message.startswith("RecipeViewSet.list: "))
+                self.assertIn("Повторяющиеся запросы:\n6 × SELECT", message)
+
+    @override_settings(QUERY_BUDGET_RAISE=False, QUERY_BUDGET_SAMPLE_RATE=1)
+    def test_n_plus_one_logged(self):
+        with self.query_per_recipe(), self.assertLogs(
+            "api.middleware", "WARNING"
+        ) as logs:
+            response = self.client.get("/api/recipes/?limit=6")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("RecipeViewSet.list", logs.output[0])
+
+    @override_settings(QUERY_BUDGET_RAISE=False, QUERY_BUDGET_SAMPLE_RATE=0)
+    def test_unsampled_requests_not_checked(self):
+        with self.query_per_recipe(), mock.patch(
+            "api.middleware.logger"
+        ) as logger:
+            self.client.get("/api/recipes/?limit=6")
+        logger.warning.assert_not_called()
@@ -1,8 +1,11 @@
+from itertools import chain
+
 from django.contrib.sites.shortcuts import get_current_site
-from django.db.models import F, Sum
-from django.http import Http404
+from django.db import transaction
+from django.db.models import F
+from django.http import Http404, StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
-from django.shortcuts import HttpResponse, get_object_or_404
+from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
@@ -11,13 +14,25 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
-from api.filters import IngredientFilter, RecipeFilter
-from api.permissions import IsAdminAuthorOrReadOnly
+from api.budgets import QueryBudget
+from api.cache import RecipeConditionalGetMixin, RecipeResponseCacheMixin
+from api.filters import RecipeFilter
+from api.helpers import get_limit, get_recipes_limit
+from api.indexes import ingredient_index, tag_registry
+from api.permissions import IsAdminAuthorOrReadOnly, IsAdminOrAuthor
+from api.renderers import (
+    ShoppingCartCSVRenderer,
+    ShoppingCartJSONRenderer,
+    ShoppingCartPDFRenderer,
+    ShoppingCartTextRenderer,
+)
 from api.serializers import (
     FavoriteSerializer,
     IngredientSerializer,
     RecipeCreateUpdateSerializer,
     RecipeGetSerializer,
+    RecipeIdsSerializer,
+    RecipeListSerializer,
     ShoppingCartSerializer,
     TagGetSerializer,
     UserSubscribeRepresentSerializer,
@@ -29,28 +44,69 @@ from recipes.models import (
     Ingredient,
     Recipe,
     ShoppingCart,
+    ShoppingCartIngredient,
+    ShortLink,
     Tag,
     User,
-    RecipeIngredient,
+    change_counter,
 )
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(
+    RecipeConditionalGetMixin, RecipeResponseCacheMixin, ModelViewSet
+):
     """Вьюсет рецепта."""
 
-    queryset = Recipe.objects.all()
     permission_classes = (IsAdminAuthorOrReadOnly,)
     http_method_names = ["get", "post", "patch", "delete"]
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    query_budgets = {
+        "list": QueryBudget(8, 12),
+        "retrieve": QueryBudget(5, 9),
+        "download_shopping_cart": 2,
+        "short_link": QueryBudget(5, 6),
+        "clicks": 4,
+    }
+
+    def get_queryset(self):
+        return Recipe.objects.with_user_flags(
+            self.get_flags_user()
+        ).select_related("author").prefetch_related(
+            "tags", "recipe_ingredients__ingredient"
+        )
 
     def get_serializer_class(self):
-        if self.action in ("list", "retrieve"):
+        if self.action == "list":
+            return RecipeListSerializer
+        if self.action == "retrieve":
             return RecipeGetSerializer
         return RecipeCreateUpdateSerializer
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+        change_counter(
+            User.objects.filter(pk=instance.author_id), "recipes_count", -1
+        )
+
+    def lock_user(self, user):
+        """Заблокировать строку пользователя до конца транзакции.
+
+        Изменения избранного и списка покупок одного пользователя
+        выполняются последовательно, поэтому агрегированный список
+        покупок не учитывает один рецепт дважды.
+        """
+        list(
+            User.objects.select_for_update().filter(
+                pk=user.pk
+            ).values_list("pk")
+        )
+
+    @transaction.atomic
     def recipe_process(self, request, pk, model, serializer, error_text):
         recipe = get_object_or_404(Recipe, id=pk)
+        self.lock_user(request.user)
 
         if request.method == "POST":
             new_item, created = model.objects.get_or_create(
@@ -59,6 +115,9 @@ class RecipeViewSet(ModelViewSet):
                 return Response(
                     {'detail': error_text},
                     status=status.HTTP_400_BAD_REQUEST)
+            change_counter(
+                Recipe.objects.filter(pk=recipe.pk), model.counter_field
+            )
             serializer = ShoppingCartSerializer(
                 new_item,
                 context={'request': request}
@@ -71,8 +130,62 @@ class RecipeViewSet(ModelViewSet):
             recipe=recipe
         )
         old_item.delete()
+        change_counter(
+            Recipe.objects.filter(pk=recipe.pk), model.counter_field, -1
+        )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @transaction.atomic
+    def recipes_bulk_process(self, request, model):
+        """Добавить или удалить несколько рецептов сразу.
+
+        В ответе перечислены id обработанных рецептов, рецептов,
+        которые уже были добавлены (или отсутствовали), и id,
+        которым не соответствует ни один рецепт.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = set(serializer.validated_data["recipes"])
+        self.lock_user(request.user)
+        found = set(
+            Recipe.objects.filter(id__in=recipe_ids).values_list(
+                "id", flat=True
+            )
+        )
+        items = model.objects.filter(user=request.user, recipe_id__in=found)
+        present = set(items.values_list("recipe_id", flat=True))
+        not_found = sorted(recipe_ids - found)
+
+        if request.method == "POST":
+            added = found - present
+            model.objects.bulk_create(
+                [model(user=request.user, recipe_id=id) for id in added],
+                ignore_conflicts=True,
+            )
+            change_counter(
+                Recipe.objects.filter(pk__in=added), model.counter_field
+            )
+            if model is ShoppingCart:
+                ShoppingCartIngredient.objects.add_recipes(
+                    request.user, added
+                )
+            return Response({
+                "added": sorted(added),
+                "already_present": sorted(present),
+                "not_found": not_found,
+            })
+
+        if present:
+            items.delete()
+            change_counter(
+                Recipe.objects.filter(pk__in=present), model.counter_field, -1
+            )
+        return Response({
+            "removed": sorted(present),
+            "not_present": sorted(found - present),
+            "not_found": not_found,
+        })
+
     @action(
         detail=True,
         methods=["post", "delete"],
@@ -101,36 +214,60 @@ class RecipeViewSet(ModelViewSet):
             'Рецепт уже добавлен в список покупок.'
         )
 
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        permission_classes=[IsAuthenticated],
+        url_path="favorite",
+    )
+    def favorite_bulk(self, request):
+        """Добавить в избранное или удалить из него список рецептов."""
+        return self.recipes_bulk_process(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        permission_classes=[IsAuthenticated],
+        url_path="shopping_cart",
+    )
+    def shopping_cart_bulk(self, request):
+        """Добавить в список покупок или удалить из него список рецептов."""
+        return self.recipes_bulk_process(request, ShoppingCart)
+
     @action(
         detail=False,
         methods=["get"],
         permission_classes=[IsAuthenticated],
+        renderer_classes=[
+            ShoppingCartTextRenderer,
+            ShoppingCartCSVRenderer,
+            ShoppingCartJSONRenderer,
+            ShoppingCartPDFRenderer,
+        ],
     )
     def download_shopping_cart(self, request):
-        user = request.user
-        if not user.carts.exists():
-            return Response(status=status.HTTP_400_BAD_REQUEST)
-
-        recipes = Recipe.objects.filter(carts__user=request.user)
-        shopping_cart = RecipeIngredient.objects.filter(
-            recipe__in=recipes
-        ).values(
+        """Скачать список покупок в формате из параметра format."""
+        shopping_cart = request.user.shopping_list.values(
+            'total_amount',
             name=F('ingredient__name'),
-            measurement_unit=F('ingredient__measurement_unit')
-        ).order_by('ingredient__name').annotate(total_amount=Sum('amount'))
-
-        text = 'Список покупок: \n\n'
+            measurement_unit=F('ingredient__measurement_unit'),
+        ).order_by('ingredient__name').iterator(chunk_size=500)
 
-        for recipe in shopping_cart:
-            text += (
-                f'{recipe["name"]}: '
-                f'{recipe["total_amount"]}/{recipe["measurement_unit"]}.\n'
-            )
+        first_row = next(shopping_cart, None)
+        if first_row is None:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        response = HttpResponse(text, content_type='text/plain')
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(chain([first_row], shopping_cart)),
+            content_type=(
+                f"{renderer.media_type}; charset={renderer.charset}"
+                if renderer.charset else renderer.media_type
+            ),
+        )
         response['Content-Disposition'] = (
             'attachment;'
-            'filename="shopping_cart.txt"'
+            f'filename="shopping_cart.{renderer.format}"'
         )
         return response
 
@@ -142,21 +279,38 @@ class RecipeViewSet(ModelViewSet):
     )
     def short_link(self, request, pk=None):
         domain = get_current_site(request)
-        data = {
-            "recipe": pk,
-            "full_link": f"https://{domain}/recipes/{pk}"
-        }
-        serializer = ShortLinkSerializer(data=data)
+        serializer = ShortLinkSerializer(data={"recipe": pk})
         serializer.is_valid(raise_exception=True)
         serializer.save()
         short_link = serializer.data.get("short_link")
 
         return Response({"short-link": f"https://{domain}/s/{short_link}/"})
 
+    @action(
+        detail=True,
+        methods=["get"],
+        permission_classes=(IsAdminOrAuthor,),
+    )
+    def clicks(self, request, pk=None):
+        """Число переходов по короткой ссылке рецепта."""
+        recipe = get_object_or_404(Recipe, pk=pk)
+        self.check_object_permissions(request, recipe)
+        link = ShortLink.objects.filter(recipe=recipe).first()
+        return Response({
+            "short_link": link.short_link if link else None,
+            "clicks": link.clicks if link else 0,
+        })
+
 
 class CustomUserViewSet(DjoserUserViewSet):
     """Вьюсет Пользователя."""
 
+    query_budgets = {
+        "list": QueryBudget(2, 4),
+        "retrieve": QueryBudget(1, 3),
+        "me": 2,
+    }
+
     @action(
         detail=False,
         methods=["GET"],
@@ -198,7 +352,9 @@ class UserSubscriptionView(APIView):
 
     permission_classes = (IsAdminAuthorOrReadOnly,)
 
+    @transaction.atomic
     def post(self, request, user_id):
+        get_recipes_limit(request)
         author = get_object_or_404(User, id=user_id)
         subscription_data = UserSubscribeSerializer(
             data={"user": request.user.id, "author": author.id},
@@ -208,6 +364,7 @@ class UserSubscriptionView(APIView):
         subscription_data.save()
         return Response(subscription_data.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def delete(self, request, user_id):
         author = get_object_or_404(User, id=user_id)
         subscription = request.user.follower.filter(author=author)
@@ -216,7 +373,10 @@ class UserSubscriptionView(APIView):
                 {"error": "Нет подписки на этого пользователя"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        subscription.delete()
+        deleted, _ = subscription.delete()
+        change_counter(
+            User.objects.filter(pk=author.pk), "followers_count", -deleted
+        )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -224,9 +384,28 @@ class UserSubscriptionsViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     """Вьюсет всех подписок на пользователей."""
 
     serializer_class = UserSubscribeRepresentSerializer
+    query_budgets = {"list": 5}
 
     def get_queryset(self):
-        return User.objects.filter(following__user=self.request.user)
+        return User.objects.filter(
+            following__user=self.request.user
+        ).order_by("username")
+
+    def list(self, request, *args, **kwargs):
+        recipes_limit = get_recipes_limit(request)
+        page = self.paginate_queryset(self.get_queryset())
+        authors = {}
+        for author in page:
+            author.limited_recipes = []
+            authors[author.id] = author
+        if authors:
+            recipes = Recipe.objects.filter(author__in=authors)
+            if recipes_limit:
+                recipes = recipes.limit_per_author(recipes_limit)
+            for recipe in recipes:
+                authors[recipe.author_id].limited_recipes.append(recipe)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 class TagViewSet(ModelViewSet):
@@ -236,6 +415,19 @@ class TagViewSet(ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagGetSerializer
     pagination_class = None
+    query_budgets = {
+        "list": QueryBudget(1, 2),
+        "retrieve": QueryBudget(1, 2),
+    }
+
+    def list(self, request, *args, **kwargs):
+        return Response(tag_registry.list())
+
+    def retrieve(self, request, *args, **kwargs):
+        tag = tag_registry.get(kwargs["pk"])
+        if tag is None:
+            raise Http404
+        return Response(tag)
 
 
 class IngredientViewSet(ModelViewSet):
@@ -244,6 +436,16 @@ class IngredientViewSet(ModelViewSet):
     http_method_names = ["get"]
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (DjangoFilterBackend,)
-    filterset_class = IngredientFilter
     pagination_class = None
+    query_budgets = {
+        "list": QueryBudget(1, 2),
+        "retrieve": QueryBudget(1, 2),
+    }
+
+    def list(self, request, *args, **kwargs):
+        return Response(
+            ingredient_index.search(
+                request.query_params.get("name", ""),
+                get_limit(request, "limit"),
+            )
+        )
@@ -16,16 +16,19 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework.authtoken",
     "djoser",
     "django_filters",
     "api",
     "recipes",
+    "jobs",
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "api.middleware.ServerTimingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -65,6 +68,44 @@ DATABASES = {
     }
 }
 
+# Версии кэша ответов, тегов, ингредиентов и коротких ссылок должны быть
+# общими для backend и worker, поэтому без DEBUG по умолчанию — memcached.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache" if DEBUG
+            else "django.core.cache.backends.memcached.PyMemcacheCache",
+        ),
+        "LOCATION": os.getenv(
+            "CACHE_LOCATION", "" if DEBUG else "cache:11211"
+        ),
+    }
+}
+
+RECIPE_CACHE_TIMEOUT = int(os.getenv("RECIPE_CACHE_TIMEOUT", 300))
+
+JOBS_EAGER = os.getenv("JOBS_EAGER", "False") == "True"
+JOBS_WORKER_PROCESSES = int(os.getenv("JOBS_WORKER_PROCESSES", 2))
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", 1))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", 3))
+JOBS_RETRY_DELAY = int(os.getenv("JOBS_RETRY_DELAY", 30))
+JOBS_TIMEOUT = int(os.getenv("JOBS_TIMEOUT", 600))
+
+TEST_RUNNER = "foodgram.runner.TestRunner"
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# Под manage.py test бюджеты проверяются всегда, см. foodgram.runner.
+QUERY_BUDGET_RAISE = os.getenv("QUERY_BUDGET_RAISE", str(DEBUG)) == "True"
+QUERY_BUDGET_SAMPLE_RATE = float(os.getenv("QUERY_BUDGET_SAMPLE_RATE", 0.01))
+
+SHORT_LINK_CLICKS_FLUSH_SIZE = int(
+    os.getenv("SHORT_LINK_CLICKS_FLUSH_SIZE", 100)
+)
+SHORT_LINK_CLICKS_FLUSH_INTERVAL = int(
+    os.getenv("SHORT_LINK_CLICKS_FLUSH_INTERVAL", 10)
+)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -2,10 +2,12 @@ from django.contrib import admin
 from django.urls import include, path
 
 from api.helpers import redirect_link
+from api.metrics import metrics_view
 
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("api.urls")),
     path("s/<short_link>/", redirect_link, name="redirect_link"),
+    path("metrics", metrics_view, name="metrics"),
 ]
@@ -0,0 +1,21 @@
+from django.contrib import admin
+
+from jobs.models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Панель фоновых задач."""
+
+    list_display = (
+        "id",
+        "name",
+        "status",
+        "attempts",
+        "run_after",
+        "locked_by",
+        "finished_at",
+    )
+    list_filter = ("status", "name")
+    search_fields = ("name",)
+    readonly_fields = ("created_at", "finished_at", "locked_at", "locked_by")
@@ -0,0 +1,114 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connections
+
+from jobs.queue import claim_job, run_job
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """Цикл обработки задач в одном процессе."""
+
+    def __init__(self, name, poll_interval, burst):
+        self.name = name
+        self.poll_interval = poll_interval
+        self.burst = burst
+        self.stopping = False
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        processed = 0
+        while not self.stopping:
+            close_old_connections()
+            try:
+                job = claim_job(self.name)
+                if job is not None:
+                    run_job(job)
+                    processed += 1
+                    continue
+            except DatabaseError:
+                logger.exception("Ошибка базы данных в обработчике задач.")
+                connections.close_all()
+            else:
+                if self.burst:
+                    break
+            time.sleep(self.poll_interval)
+        connections.close_all()
+        return processed
+
+
+def run_worker(name, poll_interval, burst):
+    Worker(name, poll_interval, burst).run()
+
+
+class Command(BaseCommand):
+    help = "Запустить обработчики фоновых задач."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=settings.JOBS_WORKER_PROCESSES,
+            help="Число процессов-обработчиков.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.JOBS_POLL_INTERVAL,
+            help="Пауза в секундах, когда очередь пуста.",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Выполнить готовые задачи и завершиться.",
+        )
+
+    def handle(self, *args, **options):
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        if options["processes"] <= 1:
+            processed = Worker(
+                prefix, options["poll_interval"], options["burst"]
+            ).run()
+            self.stdout.write(f"Выполнено задач: {processed}.")
+            return
+
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(
+                target=run_worker,
+                args=(
+                    f"{prefix}:{number}",
+                    options["poll_interval"],
+                    options["burst"],
+                ),
+            )
+            for number in range(options["processes"])
+        ]
+        for process in processes:
+            process.start()
+
+        def terminate(*args):
+            for process in processes:
+                process.terminate()
+
+        signal.signal(signal.SIGTERM, terminate)
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            terminate()
+            for process in processes:
+                process.join()
@@ -0,0 +1,82 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Модель фоновой задачи."""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = (
+        (PENDING, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Выполнена"),
+        (FAILED, "Ошибка"),
+    )
+
+    name = models.CharField(
+        verbose_name="Функция",
+        max_length=200,
+    )
+    kwargs = models.JSONField(
+        verbose_name="Аргументы",
+        default=dict,
+        blank=True,
+    )
+    status = models.CharField(
+        verbose_name="Статус",
+        max_length=20,
+        choices=STATUSES,
+        default=PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name="Попытки",
+        default=0,
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        verbose_name="Максимум попыток",
+        default=3,
+    )
+    run_after = models.DateTimeField(
+        verbose_name="Не раньше",
+        default=timezone.now,
+    )
+    locked_at = models.DateTimeField(
+        verbose_name="Взята в работу",
+        null=True,
+        blank=True,
+    )
+    locked_by = models.CharField(
+        verbose_name="Обработчик",
+        max_length=100,
+        blank=True,
+    )
+    last_error = models.TextField(
+        verbose_name="Последняя ошибка",
+        blank=True,
+    )
+    created_at = models.DateTimeField(
+        verbose_name="Создана",
+        auto_now_add=True,
+    )
+    finished_at = models.DateTimeField(
+        verbose_name="Завершена",
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = "Задача"
+        verbose_name_plural = "Задачи"
+        ordering = ["-id"]
+        indexes = [
+            models.Index(
+                fields=["status", "run_after"],
+                name="jobs_job_status_run_after_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
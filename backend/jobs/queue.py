@@ -0,0 +1,125 @@
+import logging
+import traceback
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def run_eager(name, kwargs):
+    try:
+        import_string(name)(**kwargs)
+    except Exception:
+        logger.exception("Задача %s завершилась ошибкой.", name)
+
+
+def enqueue(name, unique=False, **kwargs):
+    """Поставить в очередь вызов функции name с аргументами kwargs.
+
+    Задача сохраняется в текущей транзакции и становится видна
+    обработчикам вместе с её данными. С unique=True задача не
+    добавляется, если такая же уже ждёт в очереди. При JOBS_EAGER
+    функция выполняется сразу после фиксации транзакции.
+    """
+    if settings.JOBS_EAGER:
+        transaction.on_commit(partial(run_eager, name, kwargs))
+        return None
+    if unique:
+        job = Job.objects.filter(
+            name=name, kwargs=kwargs, status=Job.PENDING
+        ).first()
+        if job is not None:
+            return job
+    return Job.objects.create(
+        name=name,
+        kwargs=kwargs,
+        max_attempts=settings.JOBS_MAX_ATTEMPTS,
+    )
+
+
+def enqueue_many(name, kwargs_list):
+    """Поставить в очередь вызовы функции name одним запросом."""
+    if settings.JOBS_EAGER:
+        for kwargs in kwargs_list:
+            transaction.on_commit(partial(run_eager, name, kwargs))
+        return []
+    return Job.objects.bulk_create(
+        Job(
+            name=name,
+            kwargs=kwargs,
+            max_attempts=settings.JOBS_MAX_ATTEMPTS,
+        )
+        for kwargs in kwargs_list
+    )
+
+
+def claim_job(worker_name):
+    """Взять в работу первую готовую задачу.
+
+    На PostgreSQL строки, заблокированные другими обработчиками,
+    пропускаются через SKIP LOCKED. Захват подтверждается условным
+    UPDATE, поэтому на SQLite, где блокировок строк нет, задачу
+    также получит только один обработчик. Задачи, которые выполняются
+    дольше JOBS_TIMEOUT, считаются брошенными и выдаются повторно.
+    """
+    now = timezone.now()
+    ready = Q(status=Job.PENDING, run_after__lte=now) | Q(
+        status=Job.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.JOBS_TIMEOUT),
+    )
+    with transaction.atomic():
+        job = Job.objects.select_for_update(skip_locked=True).filter(
+            ready
+        ).order_by("run_after", "id").first()
+        if job is None:
+            return None
+        claimed = Job.objects.filter(
+            Q(pk=job.pk) & ready,
+            status=job.status,
+            attempts=job.attempts,
+        ).update(
+            status=Job.RUNNING,
+            attempts=F("attempts") + 1,
+            locked_at=now,
+            locked_by=worker_name,
+        )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def run_job(job):
+    """Выполнить задачу и записать результат.
+
+    Упавшая задача возвращается в очередь с экспоненциально растущей
+    задержкой, пока не исчерпаны попытки.
+    """
+    try:
+        import_string(job.name)(**job.kwargs)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.PENDING
+            job.run_after = timezone.now() + timedelta(
+                seconds=settings.JOBS_RETRY_DELAY * 2 ** (job.attempts - 1)
+            )
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+        job.save(update_fields=[
+            "status", "run_after", "last_error", "finished_at"
+        ])
+        return False
+    job.status = Job.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "finished_at"])
+    return True
@@ -0,0 +1,154 @@
+import signal
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import claim_job, enqueue, enqueue_many, run_job
+
+calls = []
+
+
+def record_call(**kwargs):
+    calls.append(kwargs)
+
+
+def fail(**kwargs):
+    raise RuntimeError("Сбой задачи")
+
+
+@override_settings(
+    JOBS_EAGER=False,
+    JOBS_MAX_ATTEMPTS=3,
+    JOBS_RETRY_DELAY=30,
+    JOBS_TIMEOUT=600,
+)
+class QueueTest(TestCase):
+    """Постановка, захват и выполнение задач."""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_unique(self):
+        job = enqueue("jobs.tests.record_call", unique=True, number=1)
+        self.assertEqual(
+            enqueue("jobs.tests.record_call", unique=True, number=1), job
+        )
+        enqueue("jobs.tests.record_call", unique=True, number=2)
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_claim_takes_each_job_once(self):
+        enqueue_many(
+            "jobs.tests.record_call", [{"number": 1}, {"number": 2}]
+        )
+        first, second = Job.objects.order_by("id")
+        job = claim_job("worker-1")
+        self.assertEqual(job.pk, first.pk)
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.locked_by, "worker-1")
+        self.assertEqual(claim_job("worker-2").pk, second.pk)
+        self.assertIsNone(claim_job("worker-3"))
+
+    def test_claim_skips_delayed_jobs(self):
+        Job.objects.create(
+            name="jobs.tests.record_call",
+            run_after=timezone.now() + timedelta(minutes=1),
+        )
+        self.assertIsNone(claim_job("worker"))
+
+    def test_claim_lost_to_another_worker(self):
+        """Без блокировок строк захват подтверждает условный UPDATE."""
+        job = enqueue("jobs.tests.record_call")
+        first = QuerySet.first
+
+        def claimed_concurrently(queryset):
+            found = first(queryset)
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.RUNNING,
+                attempts=1,
+                locked_at=timezone.now(),
+                locked_by="other",
+            )
+            return found
+
+        with mock.patch.object(QuerySet, "first", claimed_concurrently):
+            self.assertIsNone(claim_job("worker"))
+        job.refresh_from_db()
+        self.assertEqual(job.locked_by, "other")
+        self.assertEqual(job.attempts, 1)
+
+    def test_abandoned_job_is_claimed_again(self):
+        job = enqueue("jobs.tests.record_call")
+        claim_job("worker-1")
+        self.assertIsNone(claim_job("worker-2"))
+        Job.objects.filter(pk=job.pk).update(
+            locked_at=timezone.now() - timedelta(seconds=601)
+        )
+        job = claim_job("worker-2")
+        self.assertEqual(job.locked_by, "worker-2")
+        self.assertEqual(job.attempts, 2)
+
+    def test_run_job(self):
+        enqueue("jobs.tests.record_call", number=1)
+        job = claim_job("worker")
+        self.assertTrue(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(calls, [{"number": 1}])
+
+    def test_failed_job_is_retried_then_failed(self):
+        job = enqueue("jobs.tests.fail")
+        for attempt in range(1, 3):
+            started = timezone.now()
+            self.assertFalse(run_job(claim_job("worker")))
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.PENDING)
+            self.assertEqual(job.attempts, attempt)
+            self.assertIn("Сбой задачи", job.last_error)
+            self.assertGreaterEqual(
+                job.run_after,
+                started + timedelta(seconds=30 * 2 ** (attempt - 1)),
+            )
+            self.assertIsNone(claim_job("worker"))
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.assertFalse(run_job(claim_job("worker")))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 3)
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(claim_job("worker"))
+
+
+@override_settings(JOBS_EAGER=False)
+class RunWorkerTest(TransactionTestCase):
+    """Команда run_worker в режиме --burst."""
+
+    def setUp(self):
+        calls.clear()
+        for signal_number in (signal.SIGTERM, signal.SIGINT):
+            self.addCleanup(
+                signal.signal, signal_number, signal.getsignal(signal_number)
+            )
+
+    def test_burst_drains_queue(self):
+        enqueue_many(
+            "jobs.tests.record_call", [{"number": 1}, {"number": 2}]
+        )
+        enqueue("jobs.tests.fail")
+        output = StringIO()
+        call_command(
+            "run_worker", "--processes", "1", "--burst", stdout=output
+        )
+        self.assertIn("Выполнено задач: 3.", output.getvalue())
+        self.assertEqual(calls, [{"number": 1}, {"number": 2}])
+        self.assertEqual(
+            sorted(Job.objects.values_list("status", flat=True)),
+            [Job.DONE, Job.DONE, Job.PENDING],
+        )
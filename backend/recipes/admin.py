@@ -17,16 +17,24 @@ from recipes.models import (
 class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 0
+    autocomplete_fields = ("ingredient",)
 
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     """Панель пользователей."""
 
-    list_display = ("id", "username", "email")
-    list_filter = ("username", "email")
+    list_display = (
+        "id",
+        "username",
+        "email",
+        "recipes_count",
+        "followers_count",
+    )
+    readonly_fields = ("recipes_count", "followers_count")
     list_display_links = ("username",)
     search_fields = ("username", "email")
+    show_full_result_count = False
 
 
 @admin.register(Ingredient)
@@ -34,9 +42,10 @@ class IngredientAdmin(admin.ModelAdmin):
     """Панель ингридиентов."""
 
     list_display = ("id", "name", "measurement_unit")
-    list_filter = ("name",)
+    list_filter = ("measurement_unit",)
     list_display_links = ("name",)
     search_fields = ("name",)
+    show_full_result_count = False
 
 
 @admin.register(Tag)
@@ -53,40 +62,64 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     """Панель корзины."""
 
     list_display = ("id", "user", "recipe")
-    search_fields = ("user", "recipe")
+    list_select_related = ("user", "recipe")
+    autocomplete_fields = ("user", "recipe")
+    search_fields = ("user__email", "user__username", "recipe__name")
+    show_full_result_count = False
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(ShoppingCartAdmin):
     """Панель избранного."""
 
-    list_display = ("id", "user", "recipe")
-    search_fields = ("user", "recipe")
-
 
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
     """Панель подписок."""
 
     list_display = ("id", "user", "author")
-    list_filter = ("user", "author")
-    search_fields = ("user", "author")
+    list_select_related = ("user", "author")
+    autocomplete_fields = ("user", "author")
+    search_fields = (
+        "user__email",
+        "user__username",
+        "author__email",
+        "author__username",
+    )
+    show_full_result_count = False
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     """Панель рецептов."""
 
-    list_display = ("id", "name", "author", "favorites_count", "recipe_image")
-    list_filter = ("name", "author", "tags")
+    list_display = (
+        "id",
+        "name",
+        "author",
+        "favorites_count",
+        "carts_count",
+        "short_link_clicks",
+        "recipe_image",
+    )
+    list_filter = ("tags",)
     list_display_links = ("name",)
-    search_fields = ("name", "author")
+    search_fields = ("name", "author__email", "author__username")
     inlines = (RecipeIngredientInline,)
-    readonly_fields = ["favorites_count"]
-
-    @admin.display(description="Добавлено в избранное")
-    def favorites_count(self, obj):
-        return obj.favorites.count()
+    readonly_fields = ["favorites_count", "carts_count", "short_link_clicks"]
+    list_select_related = ("author", "short_link")
+    autocomplete_fields = ("author", "tags")
+    show_full_result_count = False
+
+    @admin.display(
+        description="Переходы по короткой ссылке",
+        ordering="short_link__clicks",
+    )
+    def short_link_clicks(self, obj):
+        try:
+            return obj.short_link.clicks
+        except ShortLink.DoesNotExist:
+            return 0
 
     @admin.display(description="Изображение")
     def recipe_image(self, obj):
@@ -98,5 +131,9 @@ class RecipeAdmin(admin.ModelAdmin):
 class ShortLinkAdmin(admin.ModelAdmin):
     """Панель коротких ссылок."""
 
-    list_display = ("recipe", "short_link", "full_link")
-    search_fields = ("recipe",)
+    list_display = ("recipe", "short_link", "clicks")
+    readonly_fields = ("short_link", "clicks")
+    list_select_related = ("recipe",)
+    autocomplete_fields = ("recipe",)
+    search_fields = ("short_link", "recipe__name")
+    show_full_result_count = False
@@ -1,3 +1,12 @@
 MIN_VALUE = 1
 MAX_VALUE = 32000
 MIN_VALUE_MSG = "Минимальное значение для поля равно единице"
+SHORT_LINK_ALPHABET = (
+    "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+)
+SHORT_LINK_CACHE_TIMEOUT = 24 * 60 * 60
+RECIPE_IMAGE_WIDTHS = (320, 640, 1280)
+RECIPE_CARD_WIDTH = 640
+AVATAR_WIDTHS = (64, 128, 256)
+RENDITION_QUALITY = 80
+MAX_BULK_RECIPES = 100
@@ -0,0 +1,284 @@
+import json
+import sys
+import time
+from collections import Counter
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+
+from api.cache import bump_version
+from jobs.queue import enqueue_many
+from recipes.constants import MAX_VALUE, MIN_VALUE
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    Tag,
+    User,
+    change_counter,
+)
+
+
+class RecordError(ValueError):
+    """Ошибка в записи импортируемого рецепта."""
+
+
+class Command(BaseCommand):
+    help = (
+        "Импортировать рецепты из файла NDJSON: по одному JSON-объекту "
+        "с полями name, text, cooking_time, image, author, tags и "
+        "ingredients (name, measurement_unit, amount) в строке."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            default="-",
+            help="Путь к файлу или - для стандартного ввода.",
+        )
+        parser.add_argument(
+            "--author",
+            help="Email автора для записей без поля author.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Число рецептов в одной транзакции.",
+        )
+        parser.add_argument(
+            "--rejects",
+            help="Файл для отклонённых строк.",
+        )
+
+    def handle(self, *args, **options):
+        self.tags = {}
+        for tag_id, name, slug in Tag.objects.values_list(
+            "id", "name", "slug"
+        ):
+            self.tags[name] = self.tags[slug] = tag_id
+        self.ingredients = {}
+        self.ingredient_names = {}
+        for ingredient_id, name, unit in Ingredient.objects.values_list(
+            "id", "name", "measurement_unit"
+        ):
+            self.ingredients[(name, unit)] = ingredient_id
+            self.ingredient_names[name] = (
+                None if name in self.ingredient_names else ingredient_id
+            )
+        self.authors = {}
+        self.default_author = None
+        if options["author"]:
+            self.default_author = self.get_author_ids(
+                [options["author"]]
+            ).get(options["author"])
+            if self.default_author is None:
+                raise CommandError(
+                    f"Пользователь {options['author']} не найден."
+                )
+
+        source = (
+            sys.stdin if options["path"] == "-"
+            else open(options["path"], encoding="utf-8")
+        )
+        rejects = options["rejects"] and open(
+            options["rejects"], "w", encoding="utf-8"
+        )
+        imported = rejected = 0
+        started = time.monotonic()
+        try:
+            lines = enumerate(source, start=1)
+            while True:
+                batch = list(islice(lines, options["batch_size"]))
+                if not batch:
+                    break
+                records, errors = self.parse_batch(batch)
+                try:
+                    imported += self.import_batch(records)
+                except DatabaseError as error:
+                    errors += [
+                        (number, line, str(error))
+                        for number, line, _ in records
+                    ]
+                rejected += len(errors)
+                for number, line, error in sorted(errors):
+                    self.stderr.write(f"Строка {number}: {error}")
+                    if rejects:
+                        rejects.write(line)
+                if options["verbosity"] > 1:
+                    self.stdout.write(
+                        f"Строк обработано: {batch[-1][0]}, "
+                        f"импортировано: {imported}."
+                    )
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if rejects:
+                rejects.close()
+
+        if imported:
+            bump_version("recipes")
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Импортировано рецептов: {imported}, отклонено: {rejected}, "
+            f"время: {elapsed:.1f} с, "
+            f"{imported / elapsed if elapsed else 0:.0f} рецептов в секунду."
+        ))
+
+    def get_author_ids(self, emails):
+        missing = [email for email in emails if email not in self.authors]
+        if missing:
+            self.authors.update(
+                User.objects.filter(email__in=missing).values_list(
+                    "email", "id"
+                )
+            )
+        return {
+            email: self.authors[email]
+            for email in emails if email in self.authors
+        }
+
+    def parse_batch(self, batch):
+        """Разобрать строки пакета, отделив ошибочные."""
+        records = []
+        errors = []
+        parsed = []
+        for number, line in batch:
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+                if not isinstance(data, dict):
+                    raise RecordError("ожидается JSON-объект")
+            except ValueError as error:
+                errors.append((number, line, str(error)))
+                continue
+            parsed.append((number, line, data))
+
+        authors = self.get_author_ids({
+            data["author"] for _, _, data in parsed
+            if isinstance(data.get("author"), str)
+        })
+        for number, line, data in parsed:
+            try:
+                records.append((number, line, self.parse_record(
+                    data, authors
+                )))
+            except RecordError as error:
+                errors.append((number, line, str(error)))
+        return records, errors
+
+    def parse_record(self, data, authors):
+        """Проверить запись и заменить названия на id."""
+        name = data.get("name")
+        if not isinstance(name, str) or not 0 < len(name) <= 200:
+            raise RecordError("неверное название")
+        text = data.get("text")
+        if not isinstance(text, str) or not text:
+            raise RecordError("нет описания")
+        cooking_time = data.get("cooking_time")
+        if not isinstance(cooking_time, int) or not (
+            MIN_VALUE <= cooking_time <= MAX_VALUE
+        ):
+            raise RecordError("неверное время приготовления")
+        image = data.get("image", "")
+        if not isinstance(image, str):
+            raise RecordError("неверный путь к изображению")
+        author_id = (
+            authors.get(data["author"]) if "author" in data
+            else self.default_author
+        )
+        if author_id is None:
+            raise RecordError("автор не найден")
+
+        tags = data.get("tags")
+        if not isinstance(tags, list) or not tags:
+            raise RecordError("нет тегов")
+        tag_ids = set()
+        for tag in tags:
+            if tag not in self.tags:
+                raise RecordError(f"неизвестный тег {tag}")
+            tag_ids.add(self.tags[tag])
+
+        ingredients = data.get("ingredients")
+        if not isinstance(ingredients, list) or not ingredients:
+            raise RecordError("нет ингредиентов")
+        amounts = {}
+        for item in ingredients:
+            if not isinstance(item, dict):
+                raise RecordError("неверный ингредиент")
+            if "measurement_unit" in item:
+                ingredient_id = self.ingredients.get(
+                    (item.get("name"), item["measurement_unit"])
+                )
+            else:
+                ingredient_id = self.ingredient_names.get(item.get("name"))
+            if ingredient_id is None:
+                raise RecordError(
+                    f"неизвестный ингредиент {item.get('name')}"
+                )
+            amount = item.get("amount")
+            if not isinstance(amount, int) or not (
+                MIN_VALUE <= amount <= MAX_VALUE
+            ):
+                raise RecordError(f"неверное количество {item.get('name')}")
+            if ingredient_id in amounts:
+                raise RecordError(f"повтор ингредиента {item.get('name')}")
+            amounts[ingredient_id] = amount
+
+        return {
+            "recipe": Recipe(
+                name=name,
+                text=text,
+                cooking_time=cooking_time,
+                image=image,
+                author_id=author_id,
+            ),
+            "tag_ids": tag_ids,
+            "amounts": amounts,
+        }
+
+    @transaction.atomic
+    def import_batch(self, records):
+        """Сохранить пакет рецептов в одной транзакции.
+
+        Если база не возвращает id из массовой вставки, рецепты
+        сохраняются по одному, а ингредиенты и теги всё равно
+        записываются массово.
+        """
+        recipes = [record["recipe"] for _, _, record in records]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipe.objects.bulk_create(recipes)
+            enqueue_many(
+                "recipes.tasks.refresh_image_renditions",
+                [
+                    {"model": Recipe._meta.label, "pk": recipe.pk}
+                    for recipe in recipes if recipe.image
+                ],
+            )
+        else:
+            for recipe in recipes:
+                recipe.save()
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=record["recipe"],
+                ingredient_id=ingredient_id,
+                amount=amount,
+            )
+            for _, _, record in records
+            for ingredient_id, amount in record["amounts"].items()
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=record["recipe"], tag_id=tag_id)
+            for _, _, record in records
+            for tag_id in record["tag_ids"]
+        )
+        for author_id, count in Counter(
+            recipe.author_id for recipe in recipes
+        ).items():
+            change_counter(
+                User.objects.filter(pk=author_id), "recipes_count", count
+            )
+        return len(recipes)
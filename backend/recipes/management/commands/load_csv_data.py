@@ -1,24 +1,220 @@
 import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from api.cache import bump_version
 from recipes.models import Ingredient
 
+COPY_SQL = (
+    "CREATE TEMPORARY TABLE ingredient_staging "
+    "(name varchar(200), measurement_unit varchar(200)) ON COMMIT DROP",
+    "COPY ingredient_staging (name, measurement_unit) "
+    "FROM STDIN WITH (FORMAT csv)",
+    "INSERT INTO {table} (name, measurement_unit) "
+    "SELECT DISTINCT name, measurement_unit FROM ingredient_staging "
+    "ON CONFLICT (name, measurement_unit) DO NOTHING",
+)
+INSERT_SQL = (
+    "INSERT INTO {table} (name, measurement_unit) VALUES {values} "
+    "ON CONFLICT (name, measurement_unit) DO NOTHING"
+)
+
+
+def read_csv(file):
+    for row in csv.reader(file, delimiter=","):
+        if len(row) == 2:
+            yield row
+        elif row:
+            yield None
+
+
+def read_json(file, chunk_size=1 << 16):
+    """Читать массив JSON-объектов по одному, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    while True:
+        chunk = file.read(chunk_size)
+        buffer += chunk
+        while True:
+            buffer = buffer.lstrip()
+            if not started:
+                if not buffer:
+                    break
+                if buffer[0] != "[":
+                    raise CommandError("Ожидается массив JSON.")
+                buffer = buffer[1:]
+                started = True
+                continue
+            buffer = buffer.lstrip(",").lstrip()
+            if buffer.startswith("]"):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except ValueError:
+                if not chunk:
+                    raise CommandError("Файл JSON оборвался.")
+                break
+            buffer = buffer[end:]
+            yield (
+                (item.get("name"), item.get("measurement_unit"))
+                if isinstance(item, dict) else None
+            )
+        if not chunk:
+            return
+
+
+class RowsFile:
+    """Файлоподобный объект, отдающий строки в формате CSV для COPY."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.buffer = ""
+        self.error = None
+        self.writer = csv.writer(self)
+
+    def write(self, value):
+        self.buffer += value
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            try:
+                row = next(self.rows, None)
+            except Exception as error:
+                self.error = error
+                raise
+            if row is None:
+                break
+            self.writer.writerow(row)
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
 
 class Command(BaseCommand):
+    help = "Загрузить ингредиенты из файла CSV или JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            default="data/ingredients.csv",
+            help="Путь к файлу с ингредиентами.",
+        )
+        parser.add_argument(
+            "--format",
+            choices=("csv", "json"),
+            help="Формат файла, по умолчанию по расширению.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Число строк в одной пачке.",
+        )
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="Не использовать COPY на PostgreSQL.",
+        )
 
     def handle(self, *args, **options):
-        with open("data/ingredients.csv", "r", encoding="utf-8") as file:
-            csv_reader = csv.reader(file, delimiter=",")
-            ingredients_array = []
+        path = Path(options["path"])
+        file_format = options["format"] or path.suffix.lstrip(".").lower()
+        if file_format not in ("csv", "json"):
+            raise CommandError("Укажите формат файла: csv или json.")
+        self.rejected = 0
+        started = time.monotonic()
+        with path.open(encoding="utf-8") as file:
+            rows = self.clean(
+                read_csv(file) if file_format == "csv" else read_json(file)
+            )
+            if connection.vendor == "postgresql" and not options["no_copy"]:
+                read, created = self.copy(rows)
+            else:
+                read, created = self.insert(rows, options["batch_size"])
+        if created:
+            bump_version("ingredients")
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Прочитано строк: {read}, добавлено ингредиентов: {created}, "
+            f"пропущено строк: {self.rejected}, время: {elapsed:.1f} с, "
+            f"{read / elapsed if elapsed else 0:.0f} строк в секунду."
+        ))
+
+    def clean(self, rows):
+        """Отбросить строки без названия или со слишком длинными полями."""
+        max_length = Ingredient._meta.get_field("name").max_length
+        for row in rows:
+            if row is None or not all(
+                isinstance(value, str) and 0 < len(value) <= max_length
+                for value in row
+            ):
+                self.rejected += 1
+                continue
+            yield row
 
-            for row in csv_reader:
-                name, measurement_unit = row
+    def insert(self, rows, batch_size):
+        """Добавить строки пачками, пропуская существующие ингредиенты.
 
-                if name:
-                    ingredient = Ingredient(
-                        name=name,
-                        measurement_unit=measurement_unit
+        Число добавленных строк берётся из результата INSERT ... ON
+        CONFLICT DO NOTHING, поэтому таблицу пересчитывать не нужно.
+        """
+        fields = [
+            Ingredient._meta.get_field(name)
+            for name in ("name", "measurement_unit")
+        ]
+        read = created = 0
+        with connection.cursor() as cursor:
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    return read, created
+                read += len(batch)
+                step = connection.ops.bulk_batch_size(fields, batch)
+                for start in range(0, len(batch), step):
+                    chunk = batch[start:start + step]
+                    cursor.execute(
+                        INSERT_SQL.format(
+                            table=Ingredient._meta.db_table,
+                            values=", ".join(["(%s, %s)"] * len(chunk)),
+                        ),
+                        [value for row in chunk for value in row],
                     )
-                    ingredients_array.append(ingredient)
-            Ingredient.objects.bulk_create(ingredients_array)
+                    created += cursor.rowcount
+
+    @transaction.atomic
+    def copy(self, rows):
+        """Загрузить строки через COPY во временную таблицу.
+
+        Новые ингредиенты переносятся из неё одним INSERT, уже
+        существующие пропускаются по ограничению уникальности.
+        """
+        read = 0
+
+        def counted(rows):
+            nonlocal read
+            for row in rows:
+                read += 1
+                yield row
+
+        create_sql, copy_sql, insert_sql = COPY_SQL
+        rows_file = RowsFile(counted(rows))
+        with connection.cursor() as cursor:
+            cursor.execute(create_sql)
+            try:
+                cursor.copy_expert(copy_sql, rows_file)
+            except Exception:
+                if rows_file.error is not None:
+                    raise rows_file.error from None
+                raise
+            cursor.execute(
+                insert_sql.format(table=Ingredient._meta.db_table)
+            )
+            return read, cursor.rowcount
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from jobs.queue import enqueue
+from recipes.models import Recipe, User
+from recipes.tasks import refresh_image_renditions
+
+
+class Command(BaseCommand):
+    help = "Создать уменьшенные копии изображений рецептов и аватаров."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Пересоздать копии, даже если они уже есть.",
+        )
+        parser.add_argument(
+            "--enqueue",
+            action="store_true",
+            help="Поставить задачи в очередь вместо выполнения на месте.",
+        )
+
+    def handle(self, *args, **options):
+        for model in (Recipe, User):
+            created = failed = 0
+            queryset = model.objects.exclude(
+                **{model.image_field: ""}
+            ).exclude(**{f"{model.image_field}__isnull": True})
+            for instance in queryset.iterator():
+                if not (options["force"] or instance.renditions_outdated()):
+                    continue
+                if options["enqueue"]:
+                    enqueue(
+                        "recipes.tasks.refresh_image_renditions",
+                        unique=True,
+                        model=model._meta.label,
+                        pk=instance.pk,
+                        force=options["force"],
+                    )
+                    created += 1
+                    continue
+                try:
+                    created += refresh_image_renditions(
+                        model._meta.label, instance.pk, options["force"]
+                    )
+                except (OSError, ValueError) as error:
+                    failed += 1
+                    self.stderr.write(f"{instance}: {error}")
+            self.stdout.write(
+                f"{model._meta.verbose_name_plural}: обработано {created}, "
+                f"ошибок {failed}."
+            )
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import ShoppingCart, ShoppingCartIngredient
+
+
+class Command(BaseCommand):
+    help = "Проверить и восстановить агрегированные списки покупок."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только сообщить о расхождениях, не исправляя их.",
+        )
+
+    def handle(self, *args, **options):
+        expected = {
+            (user_id, ingredient_id): total_amount
+            for user_id, ingredient_id, total_amount
+            in ShoppingCart.objects.filter(
+                recipe__recipe_ingredients__isnull=False
+            ).values_list(
+                "user_id", "recipe__recipe_ingredients__ingredient_id"
+            ).annotate(
+                total_amount=Sum("recipe__recipe_ingredients__amount")
+            ).order_by().iterator()
+        }
+        stale_ids = []
+        changed = []
+        for item in ShoppingCartIngredient.objects.iterator():
+            total_amount = expected.pop(
+                (item.user_id, item.ingredient_id), None
+            )
+            if total_amount is None:
+                stale_ids.append(item.id)
+            elif total_amount != item.total_amount:
+                item.total_amount = total_amount
+                changed.append(item)
+        missing = [
+            ShoppingCartIngredient(
+                user_id=user_id,
+                ingredient_id=ingredient_id,
+                total_amount=total_amount,
+            )
+            for (user_id, ingredient_id), total_amount in expected.items()
+        ]
+
+        self.stdout.write(
+            f"Лишних строк: {len(stale_ids)}, "
+            f"неверных сумм: {len(changed)}, "
+            f"недостающих строк: {len(missing)}."
+        )
+        if options["check"] or not (stale_ids or changed or missing):
+            return
+
+        with transaction.atomic():
+            ShoppingCartIngredient.objects.filter(id__in=stale_ids).delete()
+            ShoppingCartIngredient.objects.bulk_update(
+                changed, ["total_amount"], batch_size=1000
+            )
+            ShoppingCartIngredient.objects.bulk_create(
+                missing, batch_size=1000
+            )
+        self.stdout.write(self.style.SUCCESS("Списки покупок исправлены."))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart, Subscription, User
+
+COUNTERS = (
+    (Recipe, "favorites_count", Favorite, "recipe"),
+    (Recipe, "carts_count", ShoppingCart, "recipe"),
+    (User, "recipes_count", Recipe, "author"),
+    (User, "followers_count", Subscription, "author"),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитать счётчики избранного, списков покупок, рецептов "
+        "и подписчиков и исправить разошедшиеся значения."
+    )
+
+    def get_actual(self, related, lookup):
+        return Coalesce(
+            Subquery(
+                related.objects.filter(**{lookup: OuterRef("pk")})
+                .order_by().values(lookup)
+                .annotate(count=Count("id")).values("count")
+            ),
+            0,
+        )
+
+    @transaction.atomic
+    def recount(self, model, field, related, lookup):
+        """Исправить счётчик у записей, где он отличается от числа строк."""
+        drifted = model.objects.annotate(
+            actual=self.get_actual(related, lookup)
+        ).exclude(**{field: F("actual")}).values("pk")
+        return model.objects.filter(pk__in=drifted).update(
+            **{field: self.get_actual(related, lookup)}
+        )
+
+    def handle(self, *args, **options):
+        for model, field, related, lookup in COUNTERS:
+            fixed = self.recount(model, field, related, lookup)
+            self.stdout.write(
+                f"{model._meta.object_name}.{field}: исправлено {fixed}."
+            )
@@ -0,0 +1,60 @@
+# Generated by Django 3.2 on 2026-10-17 10:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from recipes.constants import SHORT_LINK_ALPHABET
+
+
+def encode_id(number):
+    base = len(SHORT_LINK_ALPHABET)
+    code = ''
+    while True:
+        number, digit = divmod(number, base)
+        code = SHORT_LINK_ALPHABET[digit] + code
+        if not number:
+            return code
+
+
+def deduplicate_short_links(apps, schema_editor):
+    ShortLink = apps.get_model('recipes', 'ShortLink')
+    recipes = set()
+    codes = set()
+    duplicate_ids = []
+    for link in ShortLink.objects.order_by('id').iterator():
+        if link.recipe_id in recipes:
+            duplicate_ids.append(link.id)
+            continue
+        recipes.add(link.recipe_id)
+        if link.short_link is None or link.short_link in codes:
+            link.short_link = encode_id(link.id)
+            link.save(update_fields=['short_link'])
+        codes.add(link.short_link)
+    ShortLink.objects.filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            deduplicate_short_links, migrations.RunPython.noop
+        ),
+        migrations.RemoveField(
+            model_name='shortlink',
+            name='full_link',
+        ),
+        migrations.AlterField(
+            model_name='shortlink',
+            name='short_link',
+            field=models.CharField(editable=False, max_length=20, null=True, unique=True, verbose_name='Короткая ссылка'),
+        ),
+        migrations.AlterField(
+            model_name='shortlink',
+            name='recipe',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='short_link', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-17 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_short_link_per_recipe'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shortlink',
+            name='clicks',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Переходы'),
+        ),
+    ]
@@ -1,13 +1,130 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest, RowNumber
 from django.forms import ValidationError
-
-from recipes.constants import MIN_VALUE_MSG, MIN_VALUE
+from django.utils import timezone
+
+from jobs.queue import enqueue
+from recipes.constants import (
+    AVATAR_WIDTHS,
+    MIN_VALUE,
+    MIN_VALUE_MSG,
+    RECIPE_IMAGE_WIDTHS,
+    SHORT_LINK_ALPHABET,
+)
+from recipes.renditions import delete_renditions, make_renditions
 from recipes.validators import validate_username, validate_color
 
 
-class User(AbstractUser):
+def change_counter(queryset, field, delta=1):
+    """Атомарно изменить счётчик у записей выборки.
+
+    Счётчик не опускается ниже нуля, даже если успел разойтись
+    с действительным числом записей.
+    """
+    if delta:
+        queryset.update(**{field: Greatest(models.F(field) + delta, 0)})
+
+
+class CounterFieldsMixin:
+    """Поля-счётчики, изменяемые только через change_counter.
+
+    Сохранение существующего объекта не записывает счётчики, чтобы
+    устаревшие значения в памяти не затирали изменения, сделанные
+    другими запросами.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not (self._state.adding or kwargs.get("force_insert")):
+            update_fields = kwargs.get("update_fields")
+            if update_fields is None:
+                update_fields = [
+                    field.name
+                    for field in self._meta.concrete_fields
+                    if not field.primary_key
+                ]
+            kwargs["update_fields"] = [
+                name for name in update_fields
+                if name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class ImageRenditionsMixin:
+    """Уменьшенные копии изображения.
+
+    Копии создаются фоновой задачей, которая ставится в очередь при
+    загрузке нового файла или когда имя файла изображения отличается
+    от запомненного в поле копий. Пока копии не готовы, используется
+    оригинал. Поле копий записывает только задача и загрузка файла,
+    поэтому обычное сохранение объекта не затирает готовые копии.
+    """
+
+    image_field = None
+    renditions_field = None
+    rendition_widths = ()
+
+    def renditions_outdated(self):
+        image = getattr(self, self.image_field)
+        renditions = getattr(self, self.renditions_field)
+        if not image:
+            return bool(renditions)
+        return renditions.get("source") != image.name
+
+    def refresh_renditions(self):
+        """Пересоздать копии, если изображение изменилось."""
+        if not self.renditions_outdated():
+            return False
+        image = getattr(self, self.image_field)
+        delete_renditions(image.storage, getattr(self, self.renditions_field))
+        setattr(self, self.renditions_field, {})
+        if image:
+            setattr(
+                self,
+                self.renditions_field,
+                make_renditions(image, self.rendition_widths),
+            )
+        return True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        image = getattr(self, self.image_field)
+        uploaded = outdated = False
+        if update_fields is None or self.image_field in update_fields:
+            if image and not image._committed:
+                image.save(image.name, image.file, save=False)
+                setattr(self, self.renditions_field, {
+                    **getattr(self, self.renditions_field), "source": None
+                })
+                uploaded = True
+            outdated = self.renditions_outdated()
+        if uploaded and update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, self.renditions_field}
+        elif not uploaded and update_fields is None and not (
+            self._state.adding or kwargs.get("force_insert")
+        ):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name != self.renditions_field
+            ]
+        super().save(*args, **kwargs)
+        if outdated:
+            enqueue(
+                "recipes.tasks.refresh_image_renditions",
+                unique=True,
+                model=self._meta.label,
+                pk=self.pk,
+            )
+
+
+class User(ImageRenditionsMixin, CounterFieldsMixin, AbstractUser):
     """Модель пользователя."""
 
     username = models.CharField(
@@ -30,10 +147,31 @@ class User(AbstractUser):
         max_length=150,
     )
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+    avatar_renditions = models.JSONField(
+        verbose_name="Копии аватара",
+        default=dict,
+        blank=True,
+        editable=False,
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name="Рецептов",
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name="Подписчиков",
+        default=0,
+        editable=False,
+    )
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username", "first_name", "last_name"]
 
+    image_field = "avatar"
+    renditions_field = "avatar_renditions"
+    rendition_widths = AVATAR_WIDTHS
+    counter_fields = ("recipes_count", "followers_count")
+
     class Meta:
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
@@ -136,7 +274,61 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    """Запросы к рецептам."""
+
+    def with_user_flags(self, user):
+        """Добавить признаки избранного и списка покупок пользователя."""
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favorite.objects.filter(
+                    user=user, recipe=models.OuterRef("pk")
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingCart.objects.filter(
+                    user=user, recipe=models.OuterRef("pk")
+                )
+            ),
+        )
+
+    def touch(self):
+        """Отметить рецепты выборки как изменённые."""
+        return self.update(updated_at=timezone.now())
+
+    def limit_per_author(self, limit):
+        """Оставить не более limit первых по названию рецептов автора.
+
+        Рецепты нумеруются оконной функцией в разрезе автора,
+        поэтому выборка для всех авторов выполняется одним запросом.
+        """
+        ranked = self.order_by().annotate(
+            row_number=models.Window(
+                expression=RowNumber(),
+                partition_by=[models.F("author")],
+                order_by=[models.F("name").asc(), models.F("id").asc()],
+            )
+        ).values("id", "row_number")
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(
+            id__in=RawSQL(
+                f"SELECT ranked.id FROM ({sql}) AS ranked "
+                "WHERE ranked.row_number <= %s",
+                (*params, limit),
+            )
+        )
+
+
+class Recipe(ImageRenditionsMixin, CounterFieldsMixin, models.Model):
     """Модель рецептов."""
 
     name = models.CharField(
@@ -171,6 +363,39 @@ class Recipe(models.Model):
         verbose_name="Изображение",
         upload_to="recipes/",
     )
+    image_renditions = models.JSONField(
+        verbose_name="Копии изображения",
+        default=dict,
+        blank=True,
+        editable=False,
+    )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения",
+        auto_now=True,
+        db_index=True,
+    )
+    search_vector = SearchVectorField(
+        verbose_name="Поисковый вектор",
+        null=True,
+        editable=False,
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name="В избранном",
+        default=0,
+        editable=False,
+    )
+    carts_count = models.PositiveIntegerField(
+        verbose_name="В списках покупок",
+        default=0,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    image_field = "image"
+    renditions_field = "image_renditions"
+    rendition_widths = RECIPE_IMAGE_WIDTHS
+    counter_fields = ("favorites_count", "carts_count")
 
     class Meta:
         verbose_name = "Рецепт"
@@ -180,6 +405,12 @@ class Recipe(models.Model):
     def __str__(self):
         return self.name
 
+    def get_ingredient_amounts(self):
+        """Получить количество каждого ингредиента рецепта."""
+        return dict(
+            self.recipe_ingredients.values_list("ingredient_id", "amount")
+        )
+
 
 class RecipeIngredient(models.Model):
     """Модель рецепт-ингредиент."""
@@ -231,6 +462,8 @@ class Favorite(models.Model):
         related_name="favorites",
     )
 
+    counter_field = "favorites_count"
+
     class Meta:
         verbose_name = "Избранное"
         verbose_name_plural = "Избранное"
@@ -262,6 +495,8 @@ class ShoppingCart(models.Model):
         related_name="carts",
     )
 
+    counter_field = "carts_count"
+
     class Meta:
         verbose_name = "Список покупок"
         verbose_name_plural = "Списки покупок"
@@ -278,28 +513,205 @@ class ShoppingCart(models.Model):
         return f"{self.user} - {self.recipe}"
 
 
+class ShoppingCartIngredientManager(models.Manager):
+    """Инкрементальное обновление агрегированного списка покупок.
+
+    Сохранение и удаление строк списка покупок и ингредиентов рецепта
+    учитываются сигналами, в том числе при каскадном удалении. Массовые
+    операции, которые сигналы не вызывают, учитываются явно.
+    """
+
+    def apply(self, user_ids, amounts):
+        """Прибавить количества ингредиентов к спискам пользователей."""
+        amounts = {
+            ingredient_id: amount
+            for ingredient_id, amount in amounts.items()
+            if amount
+        }
+        if not amounts:
+            return
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        self.bulk_create(
+            [
+                self.model(
+                    user_id=user_id,
+                    ingredient_id=ingredient_id,
+                    total_amount=0,
+                )
+                for user_id in user_ids
+                for ingredient_id, amount in amounts.items()
+                if amount > 0
+            ],
+            ignore_conflicts=True,
+        )
+        items = self.filter(user_id__in=user_ids, ingredient_id__in=amounts)
+        items.update(
+            total_amount=Greatest(
+                models.F("total_amount") + models.Case(
+                    *(
+                        models.When(
+                            ingredient_id=ingredient_id,
+                            then=models.Value(amount),
+                        )
+                        for ingredient_id, amount in amounts.items()
+                    ),
+                    default=models.Value(0),
+                ),
+                models.Value(0),
+            )
+        )
+        items.filter(total_amount=0).delete()
+
+    def add_recipe(self, cart):
+        """Учесть рецепт, добавленный в список покупок."""
+        self.apply(
+            [cart.user_id], self.get_recipes_amounts([cart.recipe_id])
+        )
+
+    def remove_recipe(self, cart):
+        """Учесть рецепт, удалённый из списка покупок."""
+        self.apply(
+            [cart.user_id],
+            {
+                ingredient_id: -amount
+                for ingredient_id, amount
+                in self.get_recipes_amounts([cart.recipe_id]).items()
+            },
+        )
+
+    def get_recipes_amounts(self, recipe_ids):
+        """Получить суммарное количество ингредиентов рецептов."""
+        return dict(
+            RecipeIngredient.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values("ingredient_id").annotate(
+                total=models.Sum("amount")
+            ).order_by().values_list("ingredient_id", "total")
+        )
+
+    def add_recipes(self, user, recipe_ids):
+        """Учесть несколько рецептов, добавленных в список покупок."""
+        if recipe_ids:
+            self.apply([user.id], self.get_recipes_amounts(recipe_ids))
+
+    def change_recipe(self, recipe, old_amounts, new_amounts):
+        """Учесть изменение ингредиентов рецепта во всех списках."""
+        self.apply(
+            ShoppingCart.objects.filter(recipe=recipe).values_list(
+                "user_id", flat=True
+            ),
+            {
+                ingredient_id: (
+                    new_amounts.get(ingredient_id, 0)
+                    - old_amounts.get(ingredient_id, 0)
+                )
+                for ingredient_id in {*old_amounts, *new_amounts}
+            },
+        )
+
+
+class ShoppingCartIngredient(models.Model):
+    """Модель агрегированного списка покупок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        verbose_name="Пользователь",
+        on_delete=models.CASCADE,
+        related_name="shopping_list",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name="Ингредиент",
+        on_delete=models.CASCADE,
+        related_name="shopping_lists",
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name="Общее количество",
+    )
+
+    objects = ShoppingCartIngredientManager()
+
+    class Meta:
+        verbose_name = "Ингредиент списка покупок"
+        verbose_name_plural = "Ингредиенты списков покупок"
+        db_table = "recipes_shopping_cart_ingredient"
+        ordering = ["id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"],
+                name="unique_user_cart_ingredient",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.ingredient}: {self.total_amount}"
+
+
+class ShortLinkManager(models.Manager):
+    """Менеджер коротких ссылок."""
+
+    def add_clicks(self, counts):
+        """Прибавить переходы по коротким ссылкам одним запросом."""
+        return self.filter(short_link__in=counts).update(
+            clicks=models.F("clicks") + models.Case(
+                *(
+                    models.When(short_link=code, then=models.Value(number))
+                    for code, number in counts.items()
+                ),
+                default=models.Value(0),
+                output_field=models.PositiveIntegerField(),
+            )
+        )
+
+
 class ShortLink(models.Model):
     """Модель коротких ссылок."""
 
     short_link = models.CharField(
         verbose_name="Короткая ссылка",
         max_length=20,
-        null=True
+        unique=True,
+        null=True,
+        editable=False,
     )
-    recipe = models.ForeignKey(
+    recipe = models.OneToOneField(
         Recipe,
         verbose_name="Рецепт",
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        related_name="short_link",
     )
-    full_link = models.URLField(
-        verbose_name="Полная ссылка",
-        max_length=100,
-        default=None
+    clicks = models.PositiveIntegerField(
+        verbose_name="Переходы",
+        default=0,
+        editable=False,
     )
 
+    objects = ShortLinkManager()
+
     class Meta:
         verbose_name = "Короткая ссылка"
         verbose_name_plural = "Короткие ссылки"
 
     def __str__(self):
         return f"Короткая ссылка рецепта {self.recipe}"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if self.short_link is None:
+            self.short_link = self.encode_id(self.id)
+            ShortLink.objects.filter(id=self.id).update(
+                short_link=self.short_link
+            )
+
+    @staticmethod
+    def encode_id(number):
+        """Записать id в системе счисления с основанием 62."""
+        base = len(SHORT_LINK_ALPHABET)
+        code = ""
+        while True:
+            number, digit = divmod(number, base)
+            code = SHORT_LINK_ALPHABET[digit] + code
+            if not number:
+                return code
@@ -0,0 +1,89 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from recipes.constants import RENDITION_QUALITY
+
+RENDITION_FORMATS = {
+    "webp": {"format": "WEBP", "quality": RENDITION_QUALITY, "method": 4},
+    "jpeg": {
+        "format": "JPEG",
+        "quality": RENDITION_QUALITY,
+        "optimize": True,
+        "progressive": True,
+    },
+}
+
+
+def get_rendition_widths(image_width, widths):
+    """Выбрать ширины копий, не превышающие ширину оригинала.
+
+    Если оригинал уже максимальной ширины, добавляется копия
+    в его собственном размере.
+    """
+    result = [width for width in widths if width < image_width]
+    if image_width < max(widths):
+        result.append(image_width)
+    return result
+
+
+def to_rgb(image):
+    """Наложить прозрачное изображение на белый фон для JPEG."""
+    if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def make_renditions(field_file, widths):
+    """Сохранить уменьшенные копии изображения в WebP и JPEG.
+
+    Возвращает словарь с именем исходного файла и именами копий
+    в хранилище по ширинам и форматам.
+    """
+    storage = field_file.storage
+    directory, filename = os.path.split(field_file.name)
+    stem = os.path.splitext(filename)[0]
+    field_file.open("rb")
+    try:
+        image = ImageOps.exif_transpose(Image.open(field_file))
+        image.load()
+    finally:
+        field_file.close()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert(
+            "RGBA"
+            if image.mode in ("LA", "PA") or "transparency" in image.info
+            else "RGB"
+        )
+
+    sizes = {}
+    for width in get_rendition_widths(image.width, widths):
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        sizes[str(width)] = {}
+        for extension, options in RENDITION_FORMATS.items():
+            buffer = BytesIO()
+            (to_rgb(resized) if extension == "jpeg" else resized).save(
+                buffer, **options
+            )
+            sizes[str(width)][extension] = storage.save(
+                os.path.join(
+                    directory,
+                    "renditions",
+                    f"{stem}_{width}.{extension}",
+                ),
+                ContentFile(buffer.getvalue()),
+            )
+    return {"source": field_file.name, "sizes": sizes}
+
+
+def delete_renditions(storage, renditions):
+    """Удалить файлы копий из хранилища."""
+    for formats in renditions.get("sizes", {}).values():
+        for name in formats.values():
+            storage.delete(name)
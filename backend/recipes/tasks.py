@@ -0,0 +1,20 @@
+from django.apps import apps
+
+
+def refresh_image_renditions(model, pk, force=False):
+    """Пересоздать уменьшенные копии изображения объекта."""
+    model = apps.get_model(model)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return False
+    if force:
+        setattr(instance, instance.renditions_field, {
+            **getattr(instance, instance.renditions_field),
+            "source": None,
+        })
+    if not instance.refresh_renditions():
+        return False
+    instance.save(update_fields=[instance.renditions_field])
+    if hasattr(model.objects, "touch"):
+        model.objects.filter(pk=pk).touch()
+    return True
@@ -0,0 +1,240 @@
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingCartIngredient,
+    User,
+)
+
+
+class ShoppingListAggregateTest(TestCase):
+    """Инкрементальный список покупок совпадает с пересчитанным."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                email=f"user{number}@example.com",
+                username=f"user{number}",
+                first_name="Имя",
+                last_name="Фамилия",
+                password="password",
+            )
+            for number in range(2)
+        ]
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f"Ингредиент {number}", measurement_unit="г")
+            for number in range(4)
+        )
+        cls.ingredients = list(Ingredient.objects.order_by("id"))
+        first, second, third, _ = cls.ingredients
+        cls.soup = cls.create_recipe("Суп", {first: 100, second: 50})
+        cls.salad = cls.create_recipe("Салат", {second: 30, third: 10})
+
+    @classmethod
+    def create_recipe(cls, name, amounts):
+        recipe = Recipe.objects.create(
+            name=name,
+            text="Описание",
+            author=cls.users[0],
+            cooking_time=10,
+            image="recipes/test.png",
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            )
+            for ingredient, amount in amounts.items()
+        )
+        return recipe
+
+    def add_to_cart(self, user, recipe):
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+
+    def remove_from_cart(self, user, recipe):
+        ShoppingCart.objects.filter(user=user, recipe=recipe).delete()
+
+    def get_totals(self, user):
+        return dict(
+            ShoppingCartIngredient.objects.filter(user=user).values_list(
+                "ingredient__name", "total_amount"
+            )
+        )
+
+    def assertMatchesRebuild(self):
+        """Сверить агрегат с результатом rebuild_shopping_lists."""
+        before = set(
+            ShoppingCartIngredient.objects.values_list(
+                "user_id", "ingredient_id", "total_amount"
+            )
+        )
+        output = StringIO()
+        call_command("rebuild_shopping_lists", stdout=output)
+        self.assertIn(
+            "Лишних строк: 0, неверных сумм: 0, недостающих строк: 0.",
+            output.getvalue(),
+        )
+        self.assertEqual(
+            set(
+                ShoppingCartIngredient.objects.values_list(
+                    "user_id", "ingredient_id", "total_amount"
+                )
+            ),
+            before,
+        )
+
+    def test_add_recipes_sums_shared_ingredients(self):
+        user = self.users[1]
+        self.add_to_cart(user, self.soup)
+        self.add_to_cart(user, self.salad)
+        self.assertEqual(
+            self.get_totals(user),
+            {"Ингредиент 0": 100, "Ингредиент 1": 80, "Ингредиент 2": 10},
+        )
+        self.assertMatchesRebuild()
+
+    def test_remove_recipe_deletes_zero_rows(self):
+        user = self.users[1]
+        self.add_to_cart(user, self.soup)
+        self.add_to_cart(user, self.salad)
+        self.remove_from_cart(user, self.soup)
+        self.assertEqual(
+            self.get_totals(user),
+            {"Ингредиент 1": 30, "Ингредиент 2": 10},
+        )
+        self.assertFalse(
+            ShoppingCartIngredient.objects.filter(total_amount=0).exists()
+        )
+        self.remove_from_cart(user, self.salad)
+        self.assertEqual(self.get_totals(user), {})
+        self.assertMatchesRebuild()
+
+    def test_bulk_add_and_remove(self):
+        user = self.users[1]
+        recipe_ids = [self.soup.id, self.salad.id]
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=user, recipe_id=recipe_id)
+            for recipe_id in recipe_ids
+        )
+        ShoppingCartIngredient.objects.add_recipes(user, recipe_ids)
+        self.assertMatchesRebuild()
+        ShoppingCart.objects.filter(
+            user=user, recipe_id=self.salad.id
+        ).delete()
+        self.assertEqual(
+            self.get_totals(user),
+            {"Ингредиент 0": 100, "Ингредиент 1": 50},
+        )
+        self.assertMatchesRebuild()
+
+    def test_change_recipe_updates_every_cart(self):
+        first, second, third, fourth = self.ingredients
+        for user in self.users:
+            self.add_to_cart(user, self.soup)
+        self.add_to_cart(self.users[1], self.salad)
+        old_amounts = self.soup.get_ingredient_amounts()
+        RecipeIngredient.objects.filter(
+            recipe=self.soup, ingredient=first
+        ).update(amount=40)
+        ShoppingCartIngredient.objects.change_recipe(
+            self.soup, old_amounts, self.soup.get_ingredient_amounts()
+        )
+        item = RecipeIngredient.objects.get(
+            recipe=self.soup, ingredient=second
+        )
+        item.amount = 20
+        item.save()
+        RecipeIngredient.objects.create(
+            recipe=self.soup, ingredient=fourth, amount=5
+        )
+        self.assertEqual(
+            self.get_totals(self.users[0]),
+            {"Ингредиент 0": 40, "Ингредиент 1": 20, "Ингредиент 3": 5},
+        )
+        item.ingredient = third
+        item.save()
+        RecipeIngredient.objects.get(
+            recipe=self.soup, ingredient=first
+        ).delete()
+        self.assertEqual(
+            self.get_totals(self.users[0]),
+            {"Ингредиент 2": 20, "Ингредиент 3": 5},
+        )
+        self.assertEqual(
+            self.get_totals(self.users[1]),
+            {"Ингредиент 1": 30, "Ингредиент 2": 30, "Ингредиент 3": 5},
+        )
+        self.assertMatchesRebuild()
+
+    def test_change_recipe_without_carts(self):
+        old_amounts = self.salad.get_ingredient_amounts()
+        RecipeIngredient.objects.filter(recipe=self.salad).update(amount=1)
+        ShoppingCartIngredient.objects.change_recipe(
+            self.salad, old_amounts, self.salad.get_ingredient_amounts()
+        )
+        self.assertFalse(ShoppingCartIngredient.objects.exists())
+        self.assertMatchesRebuild()
+
+    def test_delete_recipe(self):
+        for user in self.users:
+            self.add_to_cart(user, self.soup)
+            self.add_to_cart(user, self.salad)
+        self.soup.delete()
+        for user in self.users:
+            self.assertEqual(
+                self.get_totals(user),
+                {"Ингредиент 1": 30, "Ингредиент 2": 10},
+            )
+        self.assertMatchesRebuild()
+
+    def test_delete_author(self):
+        reader = self.users[1]
+        self.add_to_cart(reader, self.soup)
+        self.add_to_cart(self.users[0], self.salad)
+        self.users[0].delete()
+        self.assertFalse(ShoppingCart.objects.exists())
+        self.assertFalse(ShoppingCartIngredient.objects.exists())
+        self.assertMatchesRebuild()
+
+    def test_delete_ingredient(self):
+        self.add_to_cart(self.users[1], self.soup)
+        self.add_to_cart(self.users[1], self.salad)
+        self.ingredients[1].delete()
+        self.assertEqual(
+            self.get_totals(self.users[1]),
+            {"Ингредиент 0": 100, "Ингредиент 2": 10},
+        )
+        self.assertMatchesRebuild()
+
+
+class LoadIngredientsTest(TestCase):
+    """Загрузка ингредиентов без COPY."""
+
+    def load(self, content):
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=".csv", encoding="utf-8"
+        ) as file:
+            file.write(content)
+            file.flush()
+            output = StringIO()
+            call_command(
+                "load_csv_data", file.name, "--no-copy", "--batch-size", "2",
+                stdout=output,
+            )
+        return output.getvalue()
+
+    def test_load_is_idempotent(self):
+        content = "соль,г\nсахар,г\nсоль,г\nмука,кг\nбез единицы\n"
+        output = self.load(content)
+        self.assertIn("Прочитано строк: 4, добавлено ингредиентов: 3", output)
+        self.assertIn("пропущено строк: 1", output)
+        output = self.load(content + "мука,г\n")
+        self.assertIn("Прочитано строк: 5, добавлено ингредиентов: 1", output)
+        self.assertEqual(Ingredient.objects.count(), 4)